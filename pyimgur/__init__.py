@@ -20,16 +20,30 @@ The default settings in PyImgur are identical with the Imgur default settings.
 See https://github.com/Damgaard/PyImgur for details on how to use PyImgur.
 '''
 
+import collections
+import copy
 import json
 import datetime
-import types
+import itertools
+import os
+import re
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 import requests
+import six
 import sys
+from six.moves import queue
 
 from pyimgur import decorators, errors, objects
+from pyimgur.cache import ResponseCache
+from pyimgur.cursor import Cursor
+from pyimgur.decoders import get_decoder
 from pyimgur.errors import ImgurError
-from pyimgur.helpers import _request, _test_response, _to_imgur_list
+from pyimgur.helpers import (create_session, _ByteBudget, _MultipartStream, _SingleFlight, _iter_json_items,
+                             _project, _request, _test_response, _to_imgur_list)
+from pyimgur.metrics import RequestEvent
 from objects import *
 
 
@@ -40,6 +54,7 @@ class Config(object):
     OAUTH_URL = "https://api.imgur.com/oauth2"
     PUBLIC_CATCHPA = "6LeZbt4SAAAAAG2ccJykgGk_oAqjFgQ1y6daNz-H"
     API_PATHS = {'info_album':        "/album/%s.json",
+                 'album':             '/album/%s',
                  'image':             '/image/%s',
                  'fav_image':         '/image/%s/favorite',
                  'credits':           '/credits.json',
@@ -74,87 +89,302 @@ class Config(object):
             return self.OAUTH_URL + self.API_PATHS[key]
         return self.API_URL + self.API_PATHS[key]
 
+    def endpoint_for(self, url):
+        """Return the name of the API path `url` was built from, or None.
+
+        The page number paginated urls end in is ignored.
+        """
+        if not hasattr(self, '_endpoint_patterns'):
+            # Only published once complete, for threads asking at the same time
+            patterns = []
+            for key in self.API_PATHS:
+                pattern = re.escape(self[key]).replace(re.escape('%s'), '[^/]+')
+                patterns.append((re.compile(pattern + r'(?:/\d+)?$'), key))
+            self._endpoint_patterns = patterns
+        url = url.split('?', 1)[0]
+        for pattern, key in self._endpoint_patterns:
+            if pattern.match(url):
+                return key
+        return None
 
-class BaseImgur(object):
 
-    def __init__(self, client_id, client_secret, token=None, logger=None):
+class BaseImgur(object):
+    STREAM_CHUNK_SIZE = 16 * 1024
+
+    def __init__(self, client_id, client_secret, token=None, logger=None, cache=None, lazy_objects=False,
+                 rate_limiter=None, retry_policy=None, session=None, pool_maxsize=10, json_decoder=None,
+                 metrics=None, index=None):
+        """Create a new client.
+
+        :param cache: a pyimgur.cache.ResponseCache to answer repeated GET
+            requests from. Nothing is cached if it isn't given.
+        :param lazy_objects: whether the objects made from API responses
+            copy their fields only when they are first read.
+        :param rate_limiter: a pyimgur.ratelimit.RateLimiter to pace
+            requests with. It can be shared between clients.
+        :param retry_policy: a pyimgur.retry.RetryPolicy to retry failed
+            requests with. Failed requests are not retried if it isn't given.
+        :param session: the requests.Session to send requests with, for
+            instance one made by helpers.create_session and shared with
+            other clients, so they all reuse the same connections.
+        :param pool_maxsize: the number of connections to keep open when the
+            client makes its own session.
+        :param json_decoder: the function to decode responses with, or the
+            name of a JSON library from pyimgur.decoders.BACKENDS. Defaults
+            to the fastest one installed.
+        :param metrics: a hook, or a list of hooks, to report every request
+            to, like a pyimgur.metrics.PrometheusExporter. See
+            pyimgur.metrics for what is reported.
+        :param index: a pyimgur.index.Index to store the images, albums and
+            accounts of responses in, for querying them offline.
+        """
         self._client_id = client_id.strip()
         self._client_secret = client_secret.strip()
         self._logger = logger
-
-        self.http = requests.Session()
+        self.cache = cache
+        self.lazy_objects = lazy_objects
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self._single_flight = _SingleFlight()
+        if json_decoder is None or isinstance(json_decoder, basestring):
+            json_decoder = get_decoder(json_decoder)
+        self.json_decoder = json_decoder
+        if metrics is not None and not isinstance(metrics, (list, tuple)):
+            metrics = [metrics]
+        self.metrics = list(metrics or [])
+        self.index = index
+
+        self._owns_session = session is None
+        self.http = create_session(pool_maxsize) if session is None else session
         self.token = token
         self.config = Config()
 
+    def __getstate__(self):
+        # Locks can't be pickled, new ones are made when the client is loaded
+        state = self.__dict__.copy()
+        del state['_single_flight']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._single_flight = _SingleFlight()
+
     @property
     def token(self):
         return self._token
 
     @token.setter
     def token(self, token):
+        # Sent with every request rather than set on the session, which may
+        # be shared with clients using other credentials. The token and its
+        # headers are replaced together, so a request sent while another
+        # thread refreshes the token never mixes the old and the new one.
         if token is not None:
-            self._token = token
-            self.http.headers = {"Authorization": "Bearer {0}".format(self._token)}
+            headers = {"Authorization": "Bearer {0}".format(token)}
         else:
-            self.http.headers = {"Authorization": "Client-ID {0}".format(self._client_id)}
+            headers = {"Authorization": "Client-ID {0}".format(self._client_id)}
+        self._credentials = (token, headers)
+
+    @property
+    def _token(self):
+        return self._credentials[0]
+
+    @property
+    def _auth_headers(self):
+        return self._credentials[1]
+
+    def with_token(self, token):
+        """Return a client that sends requests with another access token.
+
+        The new client shares everything else with this one: the session
+        and its open connections, the cache and the rate limiter, which
+        both keep the responses and credits of every token apart. It's
+        cheap to make one per user, and each can be used from its own
+        thread. Pass None to make anonymous requests.
+        """
+        client = copy.copy(self)
+        client._owns_session = False
+        client.token = token
+        return client
 
     def _log(self, msg):
         try:
             if self._logger:
-                self._logger.write('%s   %s\n' % (datetime.now().isoformat(), msg))
+                self._logger.write('%s   %s\n' % (datetime.datetime.now().isoformat(), msg))
         except:
             print "Caught exception [%s] while trying to log msg,  ignored: %s" % (sys.exc_info()[0], msg)
 
-    def _request(self, url, method="get", data={}, headers={}, client=None):
+    def _request(self, url, method="get", data=None, headers=None, client=None, stream=False, idempotent=None):
+        """Send a request and return the response, raising ImgurError on failure.
+
+        :param idempotent: whether the request is safe to send more than
+            once. If None, it's decided by the method. Only used when the
+            client has a retry policy.
+        """
         method = method.lower()
-        # Remove parameters with value None
-        for k in data.keys():
-            if data[k] is None:
-                del data[k]
+        # Leave out parameters with value None, without changing the caller's dict
+        if data is None or isinstance(data, dict):
+            data = dict((k, v) for k, v in (data or {}).items() if v is not None)
+        headers = headers or {}
 
         if not client:
             client = self.http
 
-        if method is "get":
-            r = client.request(method, url, params=data, headers=headers, allow_redirects=True)
-        else:
-            r = client.request(method, url, data=data, headers=headers, allow_redirects=True)
+        if self.metrics:
+            request_started = time.time()
+        policy = self.retry_policy
+        can_retry = policy is not None and policy.can_retry(method, idempotent)
+        attempt = 0
+        started = policy.clock() if can_retry else None
+        while True:
+            if attempt and hasattr(data, 'seek'):
+                data.seek(0)
+            try:
+                r = self._send(client, method, url, data, headers, stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if can_retry and policy.wait(attempt, started):
+                    attempt += 1
+                    continue
+                if self.metrics:
+                    self._report(RequestEvent(self.config.endpoint_for(url), method,
+                                              total=time.time() - request_started, retries=attempt,
+                                              error=e))
+                raise
+            if can_retry and r.status_code in policy.statuses and \
+                    policy.wait(attempt, started, r.headers.get('Retry-After')):
+                self._log("Retrying %s %s after status %s" % (method, url, r.status_code))
+                r.close()  # Or a streamed response keeps its connection
+                attempt += 1
+                continue
+            break
 
         self._log((r.request.method, r.url, r.status_code))
-        if r.status_code < 200 or r.status_code >= 300:
+        if self.metrics:
+            self._report_response(url, method, r, attempt, time.time() - request_started, stream)
+        # 304 Not Modified answers a conditional request for a cached response
+        if (r.status_code < 200 or r.status_code >= 300) and r.status_code != 304:
             error = None
             try:
-                error = json.loads(r.content or r.text)
+                error = self.json_decoder(r.content)
             except:
                 self._log("Couldn't jsonify error response: %s" % (r.content or r.text))
             raise ImgurError(method, r.url, r.status_code, r.content, error)
+        if self.cache is not None and method != "get":
+            self.cache.invalidate(url)
+        return r
+
+    def _report_response(self, url, method, response, retries, total, stream):
+        sent = response.request.headers.get('Content-Length')
+        if stream:
+            received = response.headers.get('Content-Length')
+        else:
+            received = len(response.content)
+        elapsed = getattr(response, 'elapsed', None)
+        self._report(RequestEvent(self.config.endpoint_for(url), method, response.status_code, total,
+                                  elapsed.total_seconds() if elapsed is not None else None,
+                                  int(sent or 0), int(received or 0), retries))
+
+    def _report(self, event):
+        for hook in self.metrics:
+            try:
+                hook.record(event)
+            except Exception:
+                self._log("Metrics hook %r failed: %s" % (hook, sys.exc_info()[1]))
+
+    def _send(self, client, method, url, data, headers, stream):
+        token, auth_headers = self._credentials
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._client_id, token, method)
+        request_headers = dict(auth_headers)
+        request_headers.update(headers)
+        if method == "get":
+            r = client.request(method, url, params=data, headers=request_headers, allow_redirects=True,
+                                stream=stream)
+        else:
+            r = client.request(method, url, data=data, headers=request_headers, allow_redirects=True,
+                                stream=stream)
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(self._client_id, token, r.headers)
         return r
 
-    def request_json(self, url, method='GET', data={}, headers={}, client=None, as_objects=True, type=None):
-        response = self._request(url, method, data, headers, client)
+    def request_json(self, url, method='GET', data=None, headers=None, client=None, as_objects=True, type=None,
+                     idempotent=None):
+        data = {} if data is None else data
+        headers = headers or {}
+        if method.lower() == 'get' and not headers:
+            # Threads asking for the same resource at the same time share
+            # one request and its parsed response
+            key = (url, ResponseCache.variant(data, self._token))
+            json_data = self._single_flight.do(
+                key, lambda: self._get_json(url, method, data, headers, client, idempotent, type))
+        else:
+            json_data = self._get_json(url, method, data, headers, client, idempotent, type)
         if as_objects and type:
-            hook = self._json_imgur_objecter(type)
+            return self._to_objects(type, json_data)
+        return json_data
+
+    def _get_json(self, url, method, data, headers, client, idempotent, type=None):
+        entry = None
+        use_cache = self.cache is not None and method.lower() == 'get'
+        if use_cache:
+            endpoint = self.config.endpoint_for(url)
+            entry = self.cache.get(endpoint, url, data, self._token)
+        if entry is not None and self.cache.is_fresh(endpoint, entry):
+            content = entry.text
+            if self.metrics:
+                self._report(RequestEvent(endpoint, method, cache_hit=True))
         else:
-            hook = None
-        return json.loads(response.text, object_hook=hook)
-
-    def _json_imgur_objecter(self, type):
-        def json_to_object(json_data):
-            if 'data' in json_data:
-                object_class = eval("objects." + type)
-                if isinstance(json_data['data'], types.ListType):
-                    object_list = []
-                    for o in json_data['data']:
-                        object_list.append(object_class.from_api_response(self, o))
-                    return object_list
-                else:
-                    return object_class.from_api_response(self, json_data['data'])
+            if entry is not None:
+                headers = dict(headers, **entry.conditional_headers())
+            response = self._request(url, method, data, headers, client, idempotent=idempotent)
+            if response.status_code == 304 and entry is None:
+                # Validators the caller sent, with nothing cached to answer
+                # from. Ask for the response itself.
+                headers = dict((k, v) for k, v in headers.items()
+                               if k.lower() not in ('if-none-match', 'if-modified-since'))
+                response = self._request(url, method, data, headers, client, idempotent=idempotent)
+                if response.status_code == 304:
+                    raise ImgurError(method, response.url, 304, response.content,
+                                     "Error doing %s on url: %s. Code: 304 without a cached response" %
+                                     (method, response.url))
+            if response.status_code == 304:
+                content = entry.text
+                self.cache.revalidated(endpoint, url, data, entry, self._token)
+            else:
+                content = response.content
+                if use_cache:
+                    self.cache.set(endpoint, url, data, content, response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'), self._token)
+                json_data = self.json_decoder(content)
+                if self.index is not None and isinstance(json_data, dict) and method.lower() != 'delete':
+                    # Only what is new to the client, cached responses are indexed already
+                    self.index.store(self.config.endpoint_for(url), type, json_data.get('data'))
+                return json_data
+        return self.json_decoder(content)
+
+    def _to_objects(self, type, json_data):
+        """Turn the data of a response into objects of the class named `type`."""
+        if not isinstance(json_data, dict) or 'data' not in json_data:
             return json_data
-        return json_to_object
+        object_class = objects.OBJECT_TYPES[type]
+        if isinstance(json_data['data'], list):
+            return [object_class.from_api_response(self, o) for o in json_data['data']]
+        return object_class.from_api_response(self, json_data['data'])
+
+    def get_credits(self):
+        """Return the remaining credits of the application and the user.
+
+        The rate limiter, if any, is updated with them.
+        """
+        credits = self.request_json(self.config['credits'])['data']
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_credits(self._client_id, self._token, credits)
+        return credits
 
     # @decorators.oauth_generator
     def get_content(self, url, params=None, start_page=0,
-                    limit=0, paginated=True, use_oauth=False, child_type=None):
+                    limit=0, paginated=True, use_oauth=False, child_type=None, prefetch=0,
+                    raw=False, fields=None, stream=False, cursor=None):
         """A generator method to return imgur content from a URL.
 
         Starts at the initial url, and fetches content using the `after`
@@ -171,11 +401,28 @@ class BaseImgur(object):
             the imgut api which may end up returning a long list is not paginated at the moment. This library
             still uses this method for those APIs, so that when imgur moves those apis to support pagination
             there would be little change here.
+        :param prefetch: the number of pages to fetch ahead of the consumer
+            on a pool of that many threads. Pages are still yielded in order
+            and the walk stops at the first empty page. 0 fetches one page
+            at a time. Only used for paginated urls that need more than one
+            page, and not when streaming.
+        :param raw: yield the dicts returned by the API instead of objects.
+        :param fields: if given, yield dicts with only these keys. Implies
+            raw.
+        :param stream: parse each page while it is downloaded, yielding
+            every item as soon as it has arrived, so memory use doesn't
+            grow with the page size. Implies raw. Streamed pages are never
+            cached.
+        :param cursor: a pyimgur.cursor.Cursor to start from instead of
+            `start_page`, and to keep up to date with the position of the
+            walk. Every item is counted as seen as it is yielded. A limit
+            counts the items the cursor has already seen.
         :returns: a list of imgur content, of type Image, GalleryImage,
             GalleryAlbum.
         """
-        objects_found = 0
-        params = params or {}
+        if cursor is None:
+            cursor = Cursor(start_page)
+        params = dict(params or {})  # The caller's dict is left as it is
         fetch_all = fetch_once = False
         if limit is None:
             fetch_all = True
@@ -185,29 +432,118 @@ class BaseImgur(object):
         else:
             fetch_once = True
 
-        use_oauth_old = self._use_oauth
-        currentPage = start_page
+        def fetch(page_url):
+            return self._fetch_page(page_url, params, child_type, raw, fields, stream)
+
+        if cursor.done or (limit > 0 and cursor.seen >= limit):
+            return
+        if paginated and prefetch > 0 and not (fetch_once or stream):
+            pages = self._prefetch_pages(fetch, url, cursor.page_numbers(), prefetch)
+        else:
+            pages = self._serial_pages(fetch, url, cursor.page_numbers(), paginated, fetch_once)
 
         # While we still need to fetch more content to reach our limit, do so.
-        while fetch_once or fetch_all or objects_found < limit:
-            self._use_oauth = use_oauth
-            try:
-                if paginated:
-                    page_data = self.request_json(url + '/' + str(currentPage), data=params, as_objects=True,
-                                                  type=child_type)
-                    currentPage += 1
-                else:
-                    page_data = self.request_json(url, data=params, as_objects=True, type=child_type)
-            finally:  # Restore _use_oauth value
-                self._use_oauth = use_oauth_old
-            fetch_once = False
-            if len(page_data) > 0:
+        skip = cursor.offset  # Items of the first page yielded before resuming
+        try:
+            for page, page_data in pages:
+                found_on_page = 0
                 for thing in page_data:
+                    found_on_page += 1
+                    if found_on_page <= skip:
+                        continue
+                    # Counted before it's yielded, so a cursor saved after
+                    # handling the item doesn't yield it again
+                    cursor.offset = found_on_page
+                    cursor.seen += 1
                     yield thing
-                    objects_found += 1
+                skip = 0
+                if found_on_page == 0:
+                    cursor.done = True
+                    return
+                cursor.advance(page)
+                if not (fetch_all or cursor.seen < limit):
+                    return
+            cursor.done = True
+        finally:
+            pages.close()
+
+    def _fetch_page(self, url, params, child_type, raw=False, fields=None, stream=False):
+        if stream:
+            return self._stream_page(url, params, fields)
+        if raw or fields:
+            page_data = self.request_json(url, data=params, as_objects=False)['data']
+            return [_project(item, fields) for item in page_data]
+        return self.request_json(url, data=params, as_objects=True, type=child_type)
+
+    def _stream_page(self, url, params, fields):
+        """Yield the items of a page as they are downloaded."""
+        response = self._request(url, data=params, stream=True)
+        try:
+            for item in _iter_json_items(response.iter_content(self.STREAM_CHUNK_SIZE), 'data',
+                                         self.json_decoder):
+                yield _project(item, fields)
+        finally:
+            response.close()
+
+    def _serial_pages(self, fetch, url, page_numbers, paginated, fetch_once):
+        """Yield (page number, page) tuples for the pages of `url`, one request at a time."""
+        for page in page_numbers:
+            if paginated:
+                yield page, fetch(url + '/' + str(page))
             else:
+                yield page, fetch(url)
+            if fetch_once:
                 return
 
+    def _prefetch_pages(self, fetch, url, page_numbers, prefetch):
+        """Yield (page number, page) tuples for the non-empty pages of `url` in order, keeping
+        `prefetch` page requests in flight."""
+        pool = ThreadPool(prefetch)
+        pending = collections.deque()
+        try:
+            while True:
+                for page in itertools.islice(page_numbers, prefetch - len(pending)):
+                    pending.append((page, pool.apply_async(fetch, (url + '/' + str(page),))))
+                if not pending:
+                    return
+                page, result = pending.popleft()
+                page_data = result.get()
+                if len(page_data) == 0:
+                    return
+                yield page, page_data
+        finally:
+            pool.terminate()
+
+    def _fetch_many(self, function, ids, concurrency, stream):
+        """Call `function` with every id, `concurrency` ids at a time.
+
+        Return an OrderedDict of the ids to the results, or if stream is
+        True, a generator of (id, result) tuples in the order they finish.
+        When `function` raises ImgurError for an id, that error is its
+        result.
+        """
+        def fetch_one(id):
+            try:
+                return id, function(id)
+            except ImgurError as e:
+                return id, e
+        results = self._map_on_pool(fetch_one, ids, concurrency, ordered=not stream)
+        if stream:
+            return results
+        return collections.OrderedDict(results)
+
+    @staticmethod
+    def _map_on_pool(function, items, size, ordered=True):
+        """Yield function(item) for every item, run on a pool of `size` threads."""
+        pool = ThreadPool(size)
+        try:
+            mapper = pool.imap if ordered else pool.imap_unordered
+            for result in mapper(function, items):
+                yield result
+        finally:
+            pool.terminate()
+
+
 class OAuth2Imgur(BaseImgur):
 
     def get_auth_url(self, response="pin", state="none"):
@@ -237,46 +573,146 @@ class OAuth2Imgur(BaseImgur):
 
 
 class AuthenticatedImgur(OAuth2Imgur):
+    #: Refresh the access token this many seconds before it expires.
+    REFRESH_MARGIN = 300
 
     def __init__(self, *args, **kwargs):
         super(AuthenticatedImgur, self).__init__(*args, **kwargs)
-        self._use_oauth = False  # Updated on a request by request basis
+        self._refresh_lock = threading.Lock()
+        self._refresh_timer = None
+        self._auto_refresh = False
+        self._credentials_version = 0
         self.clear_authentication()
 
+    def __getstate__(self):
+        state = super(AuthenticatedImgur, self).__getstate__()
+        del state['_refresh_lock']
+        # The timer isn't started again, the token is still refreshed
+        # before a request once it's about to expire
+        state['_refresh_timer'] = None
+        return state
+
+    def __setstate__(self, state):
+        super(AuthenticatedImgur, self).__setstate__(state)
+        self._refresh_lock = threading.Lock()
+
     def refresh_token(self, refresh_token=None, update_session=True):
         response = super(AuthenticatedImgur, self).refresh_access_information(
             refresh_token=refresh_token or self.refresh_token)
         if update_session:
             self.set_access_credentials(**response)
 
+    def refresh_access_token(self, version=None):
+        """Get a new access token with the refresh token.
+
+        Threads that call this while a refresh is already running wait for
+        it and use its token, instead of refreshing again.
+
+        :param version: the _credentials_version the caller found the token
+            expiring with. Nothing is refreshed if the credentials changed
+            since then.
+        """
+        if version is None:
+            version = self._credentials_version
+        with self._refresh_lock:
+            if self._credentials_version != version:
+                return  # Refreshed by another thread while we waited
+            response = self.refresh_access_information(self.refresh_token)
+            self.set_access_credentials(update_user=False, **response)
+
+    def start_auto_refresh(self):
+        """Refresh the access token in the background, REFRESH_MARGIN
+        seconds before it expires, for as long as the client is used."""
+        self._auto_refresh = True
+        self._schedule_refresh()
+
+    def stop_auto_refresh(self):
+        self._auto_refresh = False
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _schedule_refresh(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        if not (self._auto_refresh and self.refresh_token and self.expires_at):
+            return
+        delay = max(self.expires_at - self.REFRESH_MARGIN - time.time(), 0)
+        self._refresh_timer = threading.Timer(delay, self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh_access_token()
+        except Exception as e:
+            # The next request will try again before it is sent
+            self._log("Couldn't refresh the access token: %s" % e)
+
+    def _token_expiring(self):
+        return (self.refresh_token is not None and self.expires_at is not None and
+                time.time() >= self.expires_at - self.REFRESH_MARGIN)
+
+    def _request(self, url, *args, **kwargs):
+        # Read before the expiry check, or a refresh finishing in between
+        # would be done again
+        version = self._credentials_version
+        if self._token_expiring() and url != self.config['token']:
+            self.refresh_access_token(version)
+        return super(AuthenticatedImgur, self)._request(url, *args, **kwargs)
+
+    def with_token(self, token):
+        client = super(AuthenticatedImgur, self).with_token(token)
+        # Don't hand the refresh token of this user to another one
+        client._authentication = None
+        client.access_token = token
+        client.refresh_token = None
+        client.expires_at = None
+        client.user = None
+        client._refresh_lock = threading.Lock()
+        client._refresh_timer = None
+        client._auto_refresh = False
+        return client
+
     def clear_authentication(self):
         self._authentication = None
         self.access_token = None
         self.refresh_token = None
-        self.http.cookies.clear()
+        self.expires_at = None
+        if self._owns_session:
+            self.http.cookies.clear()
         self.user = None
 
     # @decorators.require_oauth
     def set_access_credentials(self, access_token, refresh_token=None, username=None,
-                               update_user=True):
+                               update_user=True, expires_in=None, scope=None, **kwargs):
         """Set the credentials used for OAuth2 authentication.
 
         Calling this function will overwrite any currently existing access
-        credentials.
+        credentials. The response of get_token and refresh_access_information
+        can be passed straight in as keyword arguments.
 
         :param access_token: the access_token of the authentication
         :param refresh_token: the refresh token of the authentication
         :param update_user: Whether or not to set the user attribute for
             identity scopes
+        :param expires_in: the number of seconds the access token is valid
+            for. With a refresh token, the access token is then refreshed
+            before it expires.
 
         """
         self.clear_authentication()
         self.access_token = access_token
         self.refresh_token = refresh_token
-        self.username = username
+        self.username = username or kwargs.get('account_username')
+        self.expires_at = time.time() + int(expires_in) if expires_in else None
+        self.token = access_token
+        self._credentials_version += 1
+        self._schedule_refresh()
         # Update the user object
-        if update_user and 'identity' in scope:
-            self.user = self.get_account(username)
+        if update_user and 'identity' in (scope or ''):
+            self.user = self.get_account(self.username)
 
     def get_me(self):
         response = self.request_json(self.config['account'] % "me")
@@ -285,46 +721,189 @@ class AuthenticatedImgur(OAuth2Imgur):
 
 
 class ImageMixin(BaseImgur):
-    def upload_image_local(self, image_path, name=None, title=None, description=None, album=None):
-        if image_path:
-            with open(image_path, 'rb') as image_file:
-                image = image_file.read()
-        return self._upload_image(image, "binary", name, title, description, album)
+    # The errors upload_images reports for an item instead of raising them
+    UPLOAD_ERRORS = (ImgurError, EnvironmentError, requests.RequestException)
 
-    def upload_image_by_url(self, url, name=None, title=None, description=None, album=None):
-        return self._upload_image(url, "URL", name, title, description, album)
+    def upload_image_local(self, image_path, name=None, title=None, description=None, album=None,
+                           idempotent=False):
+        """Upload an image from disk. The file is streamed, not read into memory.
 
-    def _upload_image(self, image, type=None, name=None, title=None, description=None, album=None):
+        Set idempotent to True to let the retry policy upload the image
+        again if the upload fails, at the risk of uploading it twice.
+        """
+        with open(image_path, 'rb') as image_file:
+            return self._upload_image(image_file, "file", name, title, description, album, idempotent)
+
+    def upload_image_by_url(self, url, name=None, title=None, description=None, album=None, idempotent=False):
+        return self._upload_image(url, "URL", name, title, description, album, idempotent)
+
+    def upload_images(self, paths_or_urls, concurrency=4, album=None, max_inflight_bytes=None,
+                      checkpoint=None):
+        """A generator method to upload many images at once.
+
+        Local files and urls can be mixed, anything starting with http:// or
+        https:// is uploaded by url. Results are yielded as each upload
+        finishes, so not in the order they were given.
+
+        :param paths_or_urls: an iterable of image paths and urls
+        :param concurrency: the number of uploads to run at the same time
+        :param album: the id of the album to add the images to, or its
+            deletehash for anonymous albums
+        :param max_inflight_bytes: if given, no new local upload is started
+            while that many bytes of local files are being uploaded
+        :param checkpoint: path of a file to record finished uploads in. If
+            the file exists, the uploads recorded in it are skipped, so an
+            interrupted batch can be run again with the same arguments.
+        :returns: (path_or_url, result) tuples, where result is the uploaded
+            Image, or the error the upload failed with: an ImgurError, an
+            EnvironmentError for a file that can't be read or a
+            requests.RequestException for a failed connection.
+        """
+        done = set()
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as checkpoint_file:
+                done = set(json.loads(line)['item'] for line in checkpoint_file if line.strip())
+        budget = _ByteBudget(max_inflight_bytes) if max_inflight_bytes else None
+        finished = queue.Queue()
+
+        def upload(item):
+            size = 0
+            try:
+                if budget and not self._is_url(item):
+                    # Waits in the worker, right before the upload starts
+                    size = os.path.getsize(item)
+                    if not budget.acquire(size):
+                        size = 0
+                        return None  # The batch was closed in the meantime
+                if self._is_url(item):
+                    return self.upload_image_by_url(item, album=album)
+                return self.upload_image_local(item, album=album)
+            except self.UPLOAD_ERRORS as e:
+                return e
+            finally:
+                if size:
+                    budget.release(size)
+
+        def run(item):
+            try:
+                finished.put((item, upload(item), None))
+            except Exception:
+                finished.put((item, None, sys.exc_info()))
+
+        items = (item for item in paths_or_urls if item not in done)
+        pool = ThreadPool(concurrency)
+        checkpoint_file = open(checkpoint, 'a') if checkpoint else None
+        try:
+            # Only a few items are handed to the pool ahead of the uploads,
+            # so the items are read as they are needed
+            pending = 0
+            for item in itertools.islice(items, 2 * concurrency):
+                pool.apply_async(run, (item,))
+                pending += 1
+            while pending:
+                item, result, exc_info = finished.get()
+                pending -= 1
+                if exc_info:
+                    six.reraise(*exc_info)
+                for next_item in itertools.islice(items, 1):
+                    pool.apply_async(run, (next_item,))
+                    pending += 1
+                if checkpoint_file and not isinstance(result, self.UPLOAD_ERRORS):
+                    checkpoint_file.write(json.dumps({'item': item, 'id': getattr(result, 'id', None)}) + '\n')
+                    checkpoint_file.flush()
+                yield item, result
+        finally:
+            if budget:
+                budget.close()
+            pool.terminate()
+            if checkpoint_file:
+                checkpoint_file.close()
+
+    @staticmethod
+    def _is_url(path_or_url):
+        return path_or_url.startswith(('http://', 'https://'))
+
+    def _upload_image(self, image, type=None, name=None, title=None, description=None, album=None,
+                      idempotent=False):
         params = {'image': image,
                   'album': album,
                   'type': type,
                   'name': name,
                   'title': title,
                   'description': description}
-        return self.request_json(self.config['upload'], 'POST', data=params, type="Image")
-
-    def delete_image(self, id):
+        if hasattr(image, 'read'):
+            del params['image']
+            fields = dict((k, v) for k, v in params.items() if v is not None)
+            body = _MultipartStream(fields, 'image', image)
+            return self.request_json(self.config['upload'], 'POST', data=body,
+                                     headers={'Content-Type': body.content_type}, type="Image",
+                                     idempotent=idempotent)
+        return self.request_json(self.config['upload'], 'POST', data=params, type="Image", idempotent=idempotent)
+
+    def delete_image(self, id, image_id=None):
         """
         Deletes an image. For an anonymous image, {id} must be the image's deletehash. If the image belongs to
         your account then passing the ID of the image is sufficient.
+
+        :param image_id: the ID of the image, when {id} is its deletehash, so
+            the image is also dropped from the cache.
         """
-        return self._request(self.config['image'] % id, "delete")
+        response = self._request(self.config['image'] % id, "delete")
+        self._invalidate_image(id, image_id)
+        if self.index is not None:
+            self.index.delete_image(image_id or id)
+        return response
 
     def get_image(self, id):
         """Get information about an image."""
         return self.request_json(self.config['image'] % id,  type="Image")
 
-    def update_img_info(self, id, title=None, description=None):
+    def get_images(self, ids, concurrency=8, stream=False):
+        """Get information about many images, `concurrency` at a time.
+
+        :returns: an OrderedDict of the ids to their Image, or to the
+            ImgurError looking them up failed with. If stream is True, a
+            generator of (id, Image or ImgurError) tuples instead, in the
+            order the lookups finish.
+        """
+        return self._fetch_many(self.get_image, ids, concurrency, stream)
+
+    def update_img_info(self, id, title=None, description=None, image_id=None):
         """Updates the title or description of an image. You can only update an image you own
-        and is associated with your account. For an anonymous image, {id} must be the image's deletehash."""
+        and is associated with your account. For an anonymous image, {id} must be the image's deletehash,
+        and {image_id} may be its ID, so the image is also dropped from the cache."""
         params = {'title': title,
                   'description': description}
-        return _request('PUT', self.config['image'] % id, data=params)
+        response = self.request_json(self.config['image'] % id, 'POST', data=params)
+        self._invalidate_image(id, image_id)
+        return response
+
+    def _invalidate_image(self, id, image_id):
+        # Writes through the deletehash only invalidate its url, not the one
+        # the image is fetched and cached with
+        if self.cache is not None and image_id is not None and image_id != id:
+            self.cache.invalidate(self.config['image'] % image_id)
 
     @decorators.require_authentication
     def fav_img(self, id):
         """Favorite an image with the given ID. The user is required to be logged in to favorite the image."""
-        return _request('POST', self.config['fav_image'] % id)
+        return self.request_json(self.config['fav_image'] % id, 'POST')
+
+
+class AlbumMixin(BaseImgur):
+    def get_album(self, id):
+        """Get information about an album."""
+        return self.request_json(self.config['album'] % id, type="Album")
+
+    def get_albums(self, ids, concurrency=8, stream=False):
+        """Get information about many albums, `concurrency` at a time.
+
+        :returns: an OrderedDict of the ids to their Album, or to the
+            ImgurError looking them up failed with. If stream is True, a
+            generator of (id, Album or ImgurError) tuples instead, in the
+            order the lookups finish.
+        """
+        return self._fetch_many(self.get_album, ids, concurrency, stream)
 
 
 class AccountMixin(BaseImgur):
@@ -387,5 +966,8 @@ class AccountMixin(BaseImgur):
 
 
 
-class Imgur(ImageMixin, AccountMixin, AuthenticatedImgur):
-    pass
\ No newline at end of file
+class Imgur(ImageMixin, AlbumMixin, AccountMixin, AuthenticatedImgur):
+    pass
+
+
+from pyimgur.async_client import AsyncImgur
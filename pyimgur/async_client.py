@@ -0,0 +1,108 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Non-blocking access to Imgur.
+
+AsyncImgur has the same methods as Imgur, but every call is run on a shared
+pool of worker threads and returns a result handle straight away. Call
+`get()` on the handle to wait for the value, or `ready()` to poll it. Errors
+raised by the call, like ImgurError, are raised again from `get()`.
+
+Methods that return generators, like upload_images or get_images with
+stream=True, already run their calls on threads of their own, so they are
+called directly and their generators returned as they are.
+'''
+
+from multiprocessing.pool import ThreadPool
+
+import pyimgur
+
+
+class AsyncImgur(object):
+    """Run the methods of an Imgur client on a pool of worker threads."""
+
+    # Methods that return generators. These are returned directly with page
+    # prefetching turned on, rather than being handed to the pool.
+    PAGINATED_METHODS = {'get_content', 'get_account_favs', 'get_account_gallery_favs',
+                         'get_account_submissions', 'get_account_albums'}
+    GENERATOR_METHODS = {'upload_images'}
+    # Methods that return generators when called with stream=True
+    STREAMING_METHODS = {'get_images', 'get_albums'}
+
+    def __init__(self, client_id=None, client_secret=None, token=None, logger=None, workers=16,
+                 prefetch=4, imgur=None):
+        """Create a new AsyncImgur.
+
+        :param workers: the number of calls that can be in flight at once.
+            The HTTP connection pool of a client created here is sized to
+            match. A given client should have a pool of at least that size.
+        :param prefetch: the number of pages paginated methods fetch ahead
+            of the consumer.
+        :param imgur: an existing Imgur instance to wrap. If it is not
+            given, one is created from the client id, secret and token.
+        """
+        self.prefetch = prefetch
+        if imgur is None:
+            imgur = pyimgur.Imgur(client_id, client_secret, token, logger, pool_maxsize=workers)
+        self.imgur = imgur
+        self._pool = ThreadPool(workers)
+        self._owns_pool = True
+
+    def __getattr__(self, name):
+        attr = getattr(self.imgur, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        if name in self.PAGINATED_METHODS:
+            def paginated(*args, **kwargs):
+                kwargs.setdefault('prefetch', self.prefetch)
+                return attr(*args, **kwargs)
+            return paginated
+        if name in self.GENERATOR_METHODS:
+            return attr
+
+        def submit(*args, **kwargs):
+            if name in self.STREAMING_METHODS and kwargs.get('stream'):
+                return attr(*args, **kwargs)
+            return self._pool.apply_async(attr, args, kwargs)
+        return submit
+
+    def with_token(self, token):
+        """Return an AsyncImgur for the client of Imgur.with_token, running
+        its calls on the pool of this one. Only this one needs closing."""
+        # Not copy.copy, which would look __setstate__ up through __getattr__
+        client = object.__new__(AsyncImgur)
+        client.__dict__.update(self.__dict__)
+        client.imgur = self.imgur.with_token(token)
+        client._owns_pool = False
+        return client
+
+    def map(self, method, iterable):
+        """Call `method` with each item of `iterable` and return the results
+        in order, as an iterator that yields each one as soon as it's done."""
+        return self._pool.imap(getattr(self.imgur, method), iterable)
+
+    def close(self):
+        """Wait for the calls in flight to finish and stop the workers."""
+        if not self._owns_pool:
+            return
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
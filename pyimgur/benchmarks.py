@@ -0,0 +1,232 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for PyImgur.
+
+None of the benchmarks talk to Imgur. The ones that make requests run
+against a pyimgur.fakeserver.FakeImgurServer on localhost, which adds a few
+milliseconds of latency to every answer. Run them with
+
+    python -m pyimgur.benchmarks [--json results.json] [--compare old.json]
+
+The --json file has the Python version and platform and a list of results,
+each with a benchmark, variant, value and unit, so runs can be compared with
+--compare or other tools.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+import pyimgur
+from pyimgur import decoders, objects
+from pyimgur.fakeserver import FakeImgurServer, fake_album, fake_image
+
+
+def album_listing(albums=500, images=10):
+    """Return the body of a response listing `albums` albums."""
+    return json.dumps({'data': [fake_album(n, images) for n in range(albums)],
+                       'success': True, 'status': 200})
+
+
+def _legacy_objecter(imgur, type):
+    """The object_hook request_json used before the type registry."""
+    def json_to_object(json_data):
+        if 'data' in json_data:
+            object_class = eval("objects." + type)
+            if isinstance(json_data['data'], list):
+                return [object_class.from_api_response(imgur, o) for o in json_data['data']]
+            return object_class.from_api_response(imgur, json_data['data'])
+        return json_data
+    return json_to_object
+
+
+def bench_hydration(albums=500, images=10, repeat=5):
+    """Time turning a large album listing into Album objects, with the
+    legacy per-dict eval hook and with the type registry."""
+    imgur = pyimgur.Imgur('client_id', 'client_secret')
+    text = album_listing(albums, images)
+    legacy = min(timeit.repeat(
+        lambda: json.loads(text, object_hook=_legacy_objecter(imgur, 'Album')), number=1, repeat=repeat))
+    registry = min(timeit.repeat(
+        lambda: imgur._to_objects('Album', json.loads(text)), number=1, repeat=repeat))
+    return {'legacy_hook': legacy, 'type_registry': registry}
+
+
+def bench_decoding(albums=500, images=10, repeat=5):
+    """Time decoding a large album listing from bytes with every installed
+    JSON library."""
+    content = album_listing(albums, images).encode('utf-8')
+    results = {}
+    for name in decoders.BACKENDS:
+        try:
+            loads = decoders.get_decoder(name)
+        except ImportError:
+            continue
+        results[name] = min(timeit.repeat(lambda: loads(content), number=1, repeat=repeat))
+    return results
+
+
+def _timed(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def bench_walk(albums=500, page_size=50, latency=0.005, repeat=3):
+    """Time walking every page of an account's albums, one page at a time,
+    with pages prefetched and with pages streamed."""
+    with FakeImgurServer(albums=albums, images_per_album=2, page_size=page_size,
+                         latency=latency) as server:
+        imgur = server.client()
+        walk = lambda **kwargs: list(imgur.get_account_albums(limit=None, **kwargs))
+        return {'serial': _timed(walk, repeat),
+                'prefetch_4': _timed(lambda: walk(prefetch=4), repeat),
+                'stream': _timed(lambda: walk(stream=True), repeat)}
+
+
+def bench_uploads(count=40, size=64 * 1024, latency=0.005, repeat=3):
+    """Time uploading `count` local files of `size` bytes with upload_images,
+    one at a time and eight at a time."""
+    directory = tempfile.mkdtemp()
+    try:
+        paths = []
+        for n in range(count):
+            paths.append(os.path.join(directory, '%d.jpg' % n))
+            with open(paths[-1], 'wb') as image_file:
+                image_file.write(os.urandom(size))
+        with FakeImgurServer(albums=0, latency=latency) as server:
+            imgur = server.client()
+            upload = lambda concurrency: list(imgur.upload_images(paths, concurrency=concurrency))
+            return {'serial': _timed(lambda: upload(1), repeat),
+                    'concurrency_8': _timed(lambda: upload(8), repeat)}
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_lookups(count=100, latency=0.005, repeat=3):
+    """Time getting `count` images by id with get_images, one at a time and
+    eight at a time."""
+    with FakeImgurServer(albums=count, images_per_album=1, latency=latency) as server:
+        imgur = server.client()
+        ids = list(server.images)
+        return {'serial': _timed(lambda: imgur.get_images(ids, concurrency=1), repeat),
+                'concurrency_8': _timed(lambda: imgur.get_images(ids, concurrency=8), repeat)}
+
+
+def bench_export(albums=200, images_per_album=5, latency=0.005, repeat=3):
+    """Time exporting an account one request at a time, and with the
+    default number of threads."""
+    from pyimgur.export import AccountExporter
+    with FakeImgurServer(albums=albums, images_per_album=images_per_album, latency=latency) as server:
+        imgur = server.client()
+        export = lambda **kwargs: AccountExporter(imgur, **kwargs).export(os.devnull)
+        return {'serial': _timed(lambda: export(workers=1, shards=1), repeat),
+                'concurrent': _timed(export, repeat)}
+
+
+class _DictImage(object):
+    """An Image the way ImgurObject stored it before __slots__."""
+    def __init__(self, json_dict):
+        for name, value in json_dict.items():
+            setattr(self, name, value)
+
+
+def bench_memory():
+    """Return the bytes used per Image object, not counting the field
+    values, with a __dict__ and with __slots__."""
+    imgur = pyimgur.Imgur('client_id', 'client_secret')
+    with_dict = _DictImage(fake_image(1))
+    with_slots = objects.Image(imgur, json_dict=fake_image(1))
+    with_unknown = objects.Image(imgur, json_dict=dict(fake_image(1), unknown_field=1))
+    return {'dict': sys.getsizeof(with_dict) + sys.getsizeof(with_dict.__dict__),
+            'slots': sys.getsizeof(with_slots),
+            'slots_with_extra': sys.getsizeof(with_unknown) + sys.getsizeof(with_unknown._extra)}
+
+
+# The benchmarks, and the unit of the values they return
+BENCHMARKS = [('hydration', bench_hydration, 's'),
+              ('decoding', bench_decoding, 's'),
+              ('walk', bench_walk, 's'),
+              ('uploads', bench_uploads, 's'),
+              ('lookups', bench_lookups, 's'),
+              ('export', bench_export, 's'),
+              ('memory', bench_memory, 'bytes')]
+
+
+def run(names=None):
+    """Run the benchmarks called `names`, or all of them, and return a
+    report of their results."""
+    results = []
+    for name, bench, unit in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for variant, value in sorted(bench().items()):
+            results.append({'benchmark': name, 'variant': variant, 'value': value, 'unit': unit})
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': int(time.time()),
+            'results': results}
+
+
+def _format(value, unit):
+    if unit == 's':
+        return '%10.2f ms' % (value * 1000)
+    return '%10d %s' % (value, unit)
+
+
+def compare(old, new):
+    """Return the lines of a table of the results of two reports, with the
+    ratio of the new values to the old ones."""
+    old_values = dict(((r['benchmark'], r['variant']), r['value']) for r in old['results'])
+    lines = []
+    for result in new['results']:
+        key = (result['benchmark'], result['variant'])
+        line = '%-10s %-16s %s' % (key + (_format(result['value'], result['unit']),))
+        if old_values.get(key):
+            line += '  %s  x%.2f' % (_format(old_values[key], result['unit']),
+                                     result['value'] / float(old_values[key]))
+        lines.append(line)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark PyImgur against a local fake Imgur.')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help='the benchmarks to run: %s. Defaults to all of them.'
+                        % ', '.join(name for name, _, _ in BENCHMARKS))
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='compare the results to the ones in this file')
+    args = parser.parse_args(argv)
+    report = run(args.benchmarks)
+    old = {'results': []}
+    if args.compare:
+        with open(args.compare) as old_file:
+            old = json.load(old_file)
+    for line in compare(old, report):
+        print(line)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(report, json_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
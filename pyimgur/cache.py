@@ -0,0 +1,217 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Caching of API responses.
+
+A ResponseCache is given to an Imgur client to avoid asking for the same
+resource again and again. Only GET requests are cached. Once a response is
+older than its ttl, it is revalidated with the ETag or Last-Modified header
+the server sent with it, so an unchanged resource isn't downloaded again. Any other request to a
+url, like deleting or updating an image, removes the cached responses for that
+url. The responses themselves are kept by a backend, either MemoryCache or
+DiskCache, or any object with the same get, set and delete methods.
+'''
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import six
+from six.moves.urllib.parse import urlencode
+
+
+def _utf8(value):
+    return value.encode('utf-8') if isinstance(value, six.text_type) else value
+
+
+class CacheEntry(object):
+    """A cached response body, the time it was stored and the validators
+    the server sent with it."""
+
+    def __init__(self, text, stored_at=None, etag=None, last_modified=None):
+        self.text = text
+        self.stored_at = time.time() if stored_at is None else stored_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def age(self):
+        return time.time() - self.stored_at
+
+    def conditional_headers(self):
+        """Return the headers that ask the server to only send the resource
+        if it changed since this entry was stored."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_dict(self):
+        return {'text': self.text, 'stored_at': self.stored_at, 'etag': self.etag,
+                'last_modified': self.last_modified}
+
+    @classmethod
+    def from_dict(cls, entry_dict):
+        return cls(**entry_dict)
+
+
+class MemoryCache(object):
+    """Keep up to `max_entries` responses in memory, evicting the least
+    recently used."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        # The variants cached for each url, so deleting a url doesn't look
+        # at every entry
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, variant):
+        with self._lock:
+            entry = self._entries.pop((url, variant), None)
+            if entry is not None:
+                self._entries[(url, variant)] = entry
+            return entry
+
+    def set(self, url, variant, entry):
+        with self._lock:
+            self._entries.pop((url, variant), None)
+            self._entries[(url, variant)] = entry
+            self._variants.setdefault(url, set()).add(variant)
+            while len(self._entries) > self.max_entries:
+                (old_url, old_variant), _ = self._entries.popitem(last=False)
+                self._forget_variant(old_url, old_variant)
+
+    def _forget_variant(self, url, variant):
+        variants = self._variants[url]
+        variants.discard(variant)
+        if not variants:
+            del self._variants[url]
+
+    def delete(self, url):
+        with self._lock:
+            for variant in self._variants.pop(url, ()):
+                del self._entries[(url, variant)]
+
+
+class DiskCache(object):
+    """Keep responses as files under `directory`, so they survive restarts.
+
+    Every url gets its own subdirectory, with a file for each set of
+    parameters it was requested with.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _url_dir(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url).hexdigest())
+
+    def _path(self, url, variant):
+        return os.path.join(self._url_dir(url), hashlib.sha1(variant).hexdigest() + '.json')
+
+    def get(self, url, variant):
+        try:
+            with open(self._path(url, variant)) as entry_file:
+                return CacheEntry.from_dict(json.load(entry_file))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, url, variant, entry):
+        url_dir = self._url_dir(url)
+        if not os.path.isdir(url_dir):
+            try:
+                os.makedirs(url_dir)
+            except OSError:  # Created by another thread in the meantime
+                pass
+        # Write to a temporary file first, so readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=url_dir)
+        with os.fdopen(fd, 'w') as entry_file:
+            json.dump(entry.to_dict(), entry_file)
+        os.rename(tmp_path, self._path(url, variant))
+
+    def delete(self, url):
+        shutil.rmtree(self._url_dir(url), ignore_errors=True)
+
+
+class ResponseCache(object):
+    """Decide which responses are cached and for how long."""
+
+    def __init__(self, backend=None, ttl=60, ttls=None):
+        """Create a new ResponseCache.
+
+        :param backend: where to keep the responses. Defaults to a
+            MemoryCache.
+        :param ttl: the number of seconds a response is used for.
+        :param ttls: a dict of endpoint names from Config.API_PATHS to the
+            number of seconds responses from that endpoint are used for,
+            overriding `ttl`. A ttl of 0 turns caching off for the endpoint.
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttl = ttl
+        self.ttls = ttls or {}
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.ttl)
+
+    @staticmethod
+    def variant(params, scope=None):
+        """Return the key of a request within the responses cached for its
+        url. Requests made with different credentials, given as `scope`,
+        never share responses."""
+        variant = ''
+        if params:
+            # urlencode only takes unicode that is ASCII on Python 2
+            variant = urlencode(sorted((_utf8(k), _utf8(v)) for k, v in params.items() if v is not None))
+        if scope:
+            variant = hashlib.sha1(scope).hexdigest()[:16] + '#' + variant
+        return variant
+
+    def get(self, endpoint, url, params, scope=None):
+        """Return the CacheEntry cached for the request, or None.
+
+        The entry may be stale, check it with `is_fresh` before using it
+        without asking the server.
+        """
+        if self.ttl_for(endpoint) <= 0:
+            return None
+        return self.backend.get(url, self.variant(params, scope))
+
+    def is_fresh(self, endpoint, entry):
+        return entry.age() <= self.ttl_for(endpoint)
+
+    def set(self, endpoint, url, params, text, etag=None, last_modified=None, scope=None):
+        if self.ttl_for(endpoint) > 0:
+            entry = CacheEntry(text, etag=etag, last_modified=last_modified)
+            self.backend.set(url, self.variant(params, scope), entry)
+
+    def revalidated(self, endpoint, url, params, entry, scope=None):
+        """Mark a stale entry fresh again, after the server answered that
+        the resource is not modified."""
+        self.set(endpoint, url, params, entry.text, entry.etag, entry.last_modified, scope)
+
+    def invalidate(self, url):
+        """Forget every cached response for `url`, whatever credentials
+        they were requested with."""
+        self.backend.delete(url)
@@ -0,0 +1,130 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Resumable walks of paginated listings.
+
+A Cursor given to get_content, or to the methods built on it like
+get_account_submissions, is kept up to date with the position of the walk:
+the page it is on, the number of items of that page already yielded, and
+the total number of items yielded. Saving it after handling each item, or
+every few items, lets a walk that was interrupted carry on where it
+stopped, by passing the loaded cursor to the same call:
+
+    cursor = Cursor.load(path) if os.path.exists(path) else Cursor()
+    for submission in imgur.get_account_submissions(limit=None, cursor=cursor):
+        handle(submission)
+        cursor.save(path)
+
+A cursor can also be split, to walk its pages from several processes.
+'''
+
+import itertools
+import json
+import os
+import tempfile
+from six.moves import range
+
+
+class Cursor(object):
+    """A position in a paginated listing."""
+
+    def __init__(self, page=0, offset=0, seen=0, step=1, end_page=None, done=False):
+        """Create a new Cursor.
+
+        :param page: the page to walk next.
+        :param offset: the number of items of that page already yielded.
+        :param seen: the number of items yielded by the walk so far. A
+            limit given to get_content counts them.
+        :param step: walk every step-th page, starting at `page`.
+        :param end_page: the page to stop before, or None to walk until
+            the first empty page.
+        :param done: whether the walk has reached its end.
+        """
+        self.page = page
+        self.offset = offset
+        self.seen = seen
+        self.step = step
+        self.end_page = end_page
+        self.done = done
+
+    def page_numbers(self):
+        """Return an iterator of the numbers of the pages left to walk."""
+        if self.end_page is None:
+            return itertools.count(self.page, self.step)
+        return iter(range(self.page, self.end_page, self.step))
+
+    def advance(self, page):
+        """Move to the page after `page`, once all its items were yielded."""
+        self.page = page + self.step
+        self.offset = 0
+        if self.end_page is not None and self.page >= self.end_page:
+            self.done = True
+
+    def split(self, shards):
+        """Return `shards` cursors that together walk the pages left to this
+        one, each of them only once.
+
+        With an end page, every cursor gets a range of consecutive pages.
+        Without one, cursor i walks every shards-th page from the i-th, and
+        stops at its first empty page, like this one would. Only the first
+        cursor starts partway into a page, where this one is.
+        """
+        if self.end_page is None:
+            cursors = [Cursor(self.page + i * self.step, step=self.step * shards, done=self.done)
+                       for i in range(shards)]
+        else:
+            pages = len(range(self.page, self.end_page, self.step))
+            size = -(-pages // shards)  # Rounded up
+            cursors = []
+            for i in range(shards):
+                start = self.page + min(i * size, pages) * self.step
+                end = self.page + min((i + 1) * size, pages) * self.step
+                cursors.append(Cursor(start, step=self.step, end_page=end,
+                                      done=self.done or start >= end))
+        cursors[0].offset = self.offset
+        cursors[0].seen = self.seen
+        return cursors
+
+    def to_dict(self):
+        return {'page': self.page, 'offset': self.offset, 'seen': self.seen, 'step': self.step,
+                'end_page': self.end_page, 'done': self.done}
+
+    @classmethod
+    def from_dict(cls, cursor_dict):
+        return cls(**cursor_dict)
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    @classmethod
+    def loads(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def save(self, path):
+        """Write the cursor to the file at `path`. The file is replaced at
+        once, so it is never left half written."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'w') as cursor_file:
+            cursor_file.write(self.dumps())
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as cursor_file:
+            return cls.loads(cursor_file.read())
+
+    def __repr__(self):
+        return 'Cursor(%s)' % ', '.join('%s=%r' % item for item in sorted(self.to_dict().items()))
@@ -0,0 +1,45 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Decoding of API responses.
+
+Responses are decoded straight from the bytes the server sent, without
+turning them into text first. A decoder is any function that takes those
+bytes, or text from a cache, and returns the decoded JSON. By default the
+fastest JSON library installed is used: orjson, ujson or simplejson, and
+the json module of the standard library when none of them is.
+'''
+
+import importlib
+
+# The libraries get_decoder tries, fastest first
+BACKENDS = ('orjson', 'ujson', 'simplejson', 'json')
+
+
+def get_decoder(name=None):
+    """Return the loads function of the JSON library called `name`.
+
+    :param name: one of BACKENDS. If None, the first of them that is
+        installed is used.
+    """
+    names = BACKENDS if name is None else (name,)
+    for backend in names:
+        try:
+            module = importlib.import_module(backend)
+        except ImportError:
+            continue
+        return module.loads
+    raise ImportError("JSON library %s is not installed" % name)
@@ -19,15 +19,13 @@ Decorators. Used to ensure proper authentication before use.
 
 from decorator import decorator
 
-# I would love to do from . import errors, _client. But sadly this gives
-# problems as _client is not defined at the runtime.
-
 import pyimgur
 
 @decorator
 def require_authentication(function, *args, **kwargs):
-    """This function requires oauth_authentication to be executed."""
-    if pyimgur._client is None or pyimgur._client.token is None:
+    """This method requires the client it's called on to have an access
+    token."""
+    if args[0].token is None:
         raise pyimgur.errors.AccessDeniedError('You need to be authenticated '
                                                'to do that')
     return function(*args, **kwargs)
@@ -0,0 +1,161 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Exporting everything about an account.
+
+An AccountExporter fetches the sections of an account, like its profile,
+favorites, submissions and albums, all at the same time on a pool of
+threads. The paginated sections are split between several threads with
+cursors. Every item is written as a line of JSON as soon as it arrives:
+
+    {"section": "albums", "item": {"id": "...", ...}}
+
+A section that fails is written as a line with an error instead. Items wait
+in a queue of limited size until they are written, so a slow output slows
+the fetching down instead of filling the memory.
+
+To spread an export over several processes or machines, give each of them
+a shard: AccountExporter(imgur, shard=(i, n)) in process i of n. Each
+process then walks its own share of the pages, and only the first one
+fetches the sections that aren't paginated.
+'''
+
+import json
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+import six
+from six.moves import queue
+
+from pyimgur.cursor import Cursor
+from pyimgur.errors import ImgurError
+
+
+class _Stopped(Exception):
+    """Raised in the fetching threads once the export was stopped."""
+
+
+class AccountExporter(object):
+    """Export the sections of an account as JSON Lines."""
+
+    SECTIONS = ('profile', 'stats', 'gallery_profile', 'favorites', 'gallery_favorites',
+                'submissions', 'albums')
+    # The sections fetched with get_content, and the config key of their url
+    PAGINATED = {'submissions': 'account_submissions', 'albums': 'account_albums'}
+    SINGLE = {'profile': 'account', 'stats': 'account_stats', 'gallery_profile': 'account_gallery_profile',
+              'favorites': 'account_favorites', 'gallery_favorites': 'gallery_favorites'}
+
+    def __init__(self, imgur, username='me', sections=SECTIONS, workers=8, shards=4, max_pending=1000,
+                 shard=None):
+        """Create a new AccountExporter.
+
+        :param imgur: the client to fetch the account with.
+        :param sections: the names of the sections to export, from SECTIONS.
+        :param workers: the number of threads fetching at the same time.
+        :param shards: the number of threads walking the pages of every
+            paginated section.
+        :param max_pending: the number of items that may wait to be written.
+        :param shard: an (index, count) tuple, to export only the share of
+            one process out of `count`.
+        """
+        unknown = set(sections) - set(self.SECTIONS)
+        if unknown:
+            raise LookupError('Unknown sections: %s' % ', '.join(sorted(unknown)))
+        self.imgur = imgur
+        self.username = username
+        self.sections = sections
+        self.workers = workers
+        self.shards = shards
+        self.max_pending = max_pending
+        self.shard = shard
+
+    def _tasks(self):
+        """Return (section, function) tuples, each function returning an
+        iterable of the items of its part of the section."""
+        index, count = self.shard or (0, 1)
+        tasks = []
+        for section in self.sections:
+            if section in self.PAGINATED:
+                url = self.imgur.config[self.PAGINATED[section]] % self.username
+                for cursor in Cursor().split(count)[index].split(self.shards):
+                    tasks.append((section, self._walker(url, cursor)))
+            elif index == 0:
+                url = self.imgur.config[self.SINGLE[section]] % self.username
+                tasks.append((section, self._getter(url)))
+        return tasks
+
+    def _walker(self, url, cursor):
+        return lambda: self.imgur.get_content(url, limit=None, raw=True, cursor=cursor)
+
+    def _getter(self, url):
+        def get():
+            data = self.imgur.request_json(url, as_objects=False)['data']
+            return data if isinstance(data, list) else [data]
+        return get
+
+    def export(self, output):
+        """Export the account to `output`, a path or a file object.
+
+        :returns: a dict of the sections to the number of items written.
+        """
+        if isinstance(output, six.string_types):
+            with open(output, 'w') as output_file:
+                return self.export(output_file)
+        pending = queue.Queue(self.max_pending)
+        stopped = threading.Event()
+        tasks = self._tasks()
+        counts = dict((section, 0) for section in self.sections)
+
+        def put(record):
+            while True:
+                try:
+                    return pending.put(record, timeout=0.1)
+                except queue.Full:
+                    if stopped.is_set():
+                        raise _Stopped()
+
+        def run(task):
+            section, function = task
+            try:
+                try:
+                    for item in function():
+                        put((section, {'section': section, 'item': item}))
+                except ImgurError as e:
+                    put((section, {'section': section, 'error': {'status': e.http_code, 'url': e.url}}))
+                put((section, None))  # This task is done
+            except _Stopped:
+                pass
+            except Exception:
+                put((section, sys.exc_info()))
+
+        pool = ThreadPool(self.workers)
+        try:
+            pool.map_async(run, tasks)
+            finished = 0
+            while finished < len(tasks):
+                section, record = pending.get()
+                if record is None:
+                    finished += 1
+                elif isinstance(record, tuple):  # An unexpected error
+                    six.reraise(*record)
+                else:
+                    output.write(json.dumps(record) + '\n')
+                    if 'item' in record:
+                        counts[section] += 1
+            return counts
+        finally:
+            stopped.set()
+            pool.terminate()
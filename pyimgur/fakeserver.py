@@ -0,0 +1,352 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+A local stand-in for the Imgur API.
+
+FakeImgurServer answers the requests of Config.API_PATHS from made up
+images and albums kept in memory, on a port of localhost. It paginates
+listings, accepts uploads, sends the X-RateLimit headers and answers with
+429 once the credits are used up, and can add latency and failures. It is
+meant for tests and benchmarks that shouldn't depend on the network or use
+up real credits:
+
+    with FakeImgurServer(albums=20) as server:
+        imgur = server.client()
+        albums = list(imgur.get_account_albums(limit=None))
+'''
+
+import collections
+import hashlib
+import json
+import re
+import threading
+import time
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qs, urlparse
+
+import pyimgur
+
+
+def fake_image(n):
+    return {'id': 'img%05d' % n, 'title': 'Image %d' % n, 'description': None,
+            'datetime': 1400000000 + n, 'type': 'image/jpeg', 'animated': False,
+            'width': 640, 'height': 480, 'size': 12345, 'views': n, 'bandwidth': 12345 * n,
+            'deletehash': None, 'link': 'http://i.imgur.com/img%05d.jpg' % n,
+            'favorite': False, 'nsfw': None, 'section': None, 'is_album': False}
+
+
+def fake_album(n, images=10):
+    return {'id': 'alb%05d' % n, 'title': 'Album %d' % n, 'description': None,
+            'datetime': 1400000000 + n, 'cover': 'img00000', 'account_url': 'user',
+            'privacy': 'public', 'layout': 'blog', 'views': n,
+            'link': 'http://imgur.com/a/alb%05d' % n, 'images_count': images,
+            'images': [fake_image(i) for i in range(images)], 'is_album': True}
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Keep connections open, so clients reuse them like they would with Imgur
+    protocol_version = 'HTTP/1.1'
+    # The headers are written one by one, don't let them wait for ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _read_body(self):
+        if self.headers.get('Content-Length'):
+            return self.rfile.read(int(self.headers.get('Content-Length')))
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()  # The CRLF after every chunk
+                if size == 0:
+                    return b''.join(chunks)
+        return b''
+
+    def _handle(self, method):
+        fake = self.server.fake
+        parsed = urlparse(self.path)
+        body = self._read_body()
+        status, payload, headers = fake.dispatch(method, parsed.path, parse_qs(parsed.query),
+                                                 body, self.headers)
+        content = json.dumps(payload).encode('utf-8')
+        if method == 'GET' and status == 200:
+            headers['ETag'] = '"%s"' % hashlib.md5(content).hexdigest()
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                status, content = 304, b''
+        if fake.latency:
+            time.sleep(fake.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeImgurServer(object):
+    """An HTTP server on localhost that answers like the Imgur API."""
+
+    ROUTES = [('GET', r'/3/image/([^/]+)$', '_get_image'),
+              ('POST', r'/3/image/([^/]+)$', '_update_image'),
+              ('DELETE', r'/3/image/([^/]+)$', '_delete_image'),
+              ('GET', r'/3/album/([^/.]+)(?:\.json)?$', '_get_album'),
+              ('POST', r'/3/upload(?:\.json)?$', '_upload'),
+              ('GET', r'/3/credits(?:\.json)?$', '_credits'),
+              ('GET', r'/3/account/([^/]+)/albums(?:/(\d+))?$', '_account_albums'),
+              ('GET', r'/3/account/([^/]+)/(?:submissions|images)(?:/(\d+))?$', '_account_images'),
+              ('GET', r'/3/account/([^/]+)/(?:gallery_)?favorites$', '_favorites'),
+              ('GET', r'/3/account/([^/]+)/stats$', '_account_stats'),
+              ('GET', r'/3/account/([^/]+)/gallery_profile$', '_gallery_profile'),
+              ('GET', r'/3/account/([^/]+)$', '_account'),
+              ('POST', r'/oauth2/token$', '_token')]
+
+    def __init__(self, albums=50, images_per_album=10, page_size=50, latency=0, fail_every=0,
+                 client_limit=12500, user_limit=2000, post_limit=1250, port=0):
+        """Create a new FakeImgurServer. It isn't listening until started.
+
+        :param albums: the number of albums the account has. Listings
+            are sorted newest first, like on Imgur.
+        :param images_per_album: the number of images in every album. The
+            account has all of the images of its albums.
+        :param page_size: the number of items on every page of a listing.
+        :param latency: the number of seconds to wait before every answer.
+        :param fail_every: if not 0, every request with that number, counted
+            from the first, is answered with a 503 error.
+        :param client_limit: the credits of the application.
+        :param user_limit: the credits of every access token, or of the
+            anonymous client.
+        :param post_limit: the number of POST requests every access token
+            can make.
+        :param port: the port to listen on. By default a free one is picked.
+        """
+        self.page_size = page_size
+        self.latency = latency
+        self.fail_every = fail_every
+        self.client_limit = client_limit
+        self.user_limit = user_limit
+        self.post_limit = post_limit
+        self.albums = collections.OrderedDict()
+        self.images = collections.OrderedDict()
+        for n in range(albums):
+            album = fake_album(n, 0)
+            album['images'] = []
+            for i in range(images_per_album):
+                image = fake_image(n * images_per_album + i)
+                self.images[image['id']] = image
+                album['images'].append(image)
+            album['images_count'] = images_per_album
+            self.albums[album['id']] = album
+        self.request_count = 0
+        self.upload_count = 0
+        self.client_remaining = client_limit
+        self._user_remaining = {}
+        self._post_remaining = {}
+        self._lock = threading.Lock()
+        self._routes = [(method, re.compile(pattern), getattr(self, name))
+                        for method, pattern, name in self.ROUTES]
+        self._httpd = _HTTPServer(('127.0.0.1', port), _Handler)
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+
+    def start(self):
+        """Start answering requests on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def point(self, imgur):
+        """Make an Imgur client send its requests to this server."""
+        imgur.config.API_URL = self.url + '/3'
+        imgur.config.OAUTH_URL = self.url + '/oauth2'
+        imgur.config.__dict__.pop('_endpoint_patterns', None)
+        return imgur
+
+    def client(self, client_id='client_id', client_secret='client_secret', **kwargs):
+        """Return a new Imgur client that talks to this server."""
+        return self.point(pyimgur.Imgur(client_id, client_secret, **kwargs))
+
+    def dispatch(self, method, path, query, body, headers):
+        """Answer a request. Return its status, the JSON payload and the
+        headers to send with it."""
+        user = headers.get('Authorization', '')
+        with self._lock:
+            self.request_count += 1
+            number = self.request_count
+            client_remaining = self.client_remaining
+            self.client_remaining = max(client_remaining - 1, 0)
+            user_remaining = self._user_remaining.get(user, self.user_limit)
+            self._user_remaining[user] = max(user_remaining - 1, 0)
+            response_headers = {'X-RateLimit-ClientLimit': self.client_limit,
+                                'X-RateLimit-ClientRemaining': self.client_remaining,
+                                'X-RateLimit-UserLimit': self.user_limit,
+                                'X-RateLimit-UserRemaining': self._user_remaining[user],
+                                'X-RateLimit-UserReset': int(time.time()) + 3600}
+            post_remaining = None
+            if method == 'POST':
+                post_remaining = self._post_remaining.get(user, self.post_limit)
+                self._post_remaining[user] = max(post_remaining - 1, 0)
+                response_headers.update({'X-Post-Rate-Limit-Limit': self.post_limit,
+                                         'X-Post-Rate-Limit-Remaining': self._post_remaining[user],
+                                         'X-Post-Rate-Limit-Reset': 3600})
+        if 0 in (client_remaining, user_remaining, post_remaining):
+            return self._error(429, 'Too Many Requests', method, path, response_headers)
+        if self.fail_every and number % self.fail_every == 0:
+            return self._error(503, 'Service Unavailable', method, path, response_headers)
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                status, data = handler(query, body, headers, *match.groups())
+                break
+        else:
+            status, data = 404, None
+        if status >= 400:
+            return self._error(status, data or 'Not Found', method, path, response_headers)
+        return status, {'data': data, 'success': True, 'status': status}, response_headers
+
+    def _error(self, status, message, method, path, headers):
+        data = {'error': message, 'request': path, 'method': method}
+        return status, {'data': data, 'success': False, 'status': status}, headers
+
+    def _page(self, items, page):
+        # Like Imgur, listings are sorted newest first
+        items = sorted(items, key=lambda item: item['datetime'], reverse=True)
+        start = int(page or 0) * self.page_size
+        return 200, items[start:start + self.page_size]
+
+    def _get_image(self, query, body, headers, id):
+        if id not in self.images:
+            return 404, 'Unable to find an image with the id, %s' % id
+        return 200, self.images[id]
+
+    def _image_id(self, id):
+        """Return the id of the image `id` is the id or deletehash of."""
+        for image in list(self.images.values()):
+            if image['deletehash'] is not None and image['deletehash'] == id:
+                return image['id']
+        return id
+
+    def _update_image(self, query, body, headers, id):
+        id = self._image_id(id)
+        if id not in self.images:
+            return 404, 'Unable to find an image with the id, %s' % id
+        fields = parse_qs(body.decode('utf-8'))
+        for name in ('title', 'description'):
+            if name in fields:
+                self.images[id][name] = fields[name][0]
+        return 200, True
+
+    def _delete_image(self, query, body, headers, id):
+        if self.images.pop(self._image_id(id), None) is None:
+            return 404, 'Unable to find an image with the id, %s' % id
+        return 200, True
+
+    def _get_album(self, query, body, headers, id):
+        if id not in self.albums:
+            return 404, 'Unable to find an album with the id, %s' % id
+        return 200, self.albums[id]
+
+    def _upload(self, query, body, headers):
+        content_type = headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            fields = dict((name.decode('utf-8'), value.decode('utf-8')) for name, value in
+                          re.findall(br'name="(\w+)"\r\n\r\n(.*?)\r\n--', body))
+            size = len(body)
+        else:
+            fields = dict((name, values[0]) for name, values in parse_qs(body.decode('utf-8')).items())
+            size = 0
+        if not size and not fields.get('image'):
+            return 400, 'No image data was sent to the upload api'
+        with self._lock:
+            self.upload_count += 1
+            image = fake_image(self.upload_count)
+            image.update(id='up%05d' % self.upload_count, size=size, views=0, datetime=int(time.time()),
+                         title=fields.get('title'), description=fields.get('description'),
+                         deletehash='del%05d' % self.upload_count)
+            self.images[image['id']] = image
+            if fields.get('album') in self.albums:
+                self.albums[fields['album']]['images'].append(image)
+        return 200, image
+
+    def _credits(self, query, body, headers):
+        user = headers.get('Authorization', '')
+        return 200, {'ClientLimit': self.client_limit, 'ClientRemaining': self.client_remaining,
+                     'UserLimit': self.user_limit,
+                     'UserRemaining': self._user_remaining.get(user, self.user_limit),
+                     'UserReset': int(time.time()) + 3600}
+
+    def _account(self, query, body, headers, username):
+        return 200, {'id': 1, 'url': 'user' if username == 'me' else username, 'bio': None,
+                     'reputation': 0, 'created': 1400000000, 'pro_expiration': False}
+
+    def _account_stats(self, query, body, headers, username):
+        return 200, {'total_images': len(self.images), 'total_albums': len(self.albums),
+                     'disk_used': sum(image['size'] for image in self.images.values()),
+                     'bandwidth_used': 0, 'top_images': [], 'top_albums': [], 'top_gallery_comments': []}
+
+    def _gallery_profile(self, query, body, headers, username):
+        return 200, {'total_gallery_comments': 0, 'total_gallery_likes': 0,
+                     'total_gallery_submissions': 0, 'trophies': []}
+
+    def _account_albums(self, query, body, headers, username, page=None):
+        return self._page(list(self.albums.values()), page)
+
+    def _account_images(self, query, body, headers, username, page=None):
+        return self._page(list(self.images.values()), page)
+
+    def _favorites(self, query, body, headers, username):
+        return self._page(list(self.images.values()), 0)
+
+    def _token(self, query, body, headers):
+        return 200, {'access_token': 'access%d' % self.request_count, 'refresh_token': 'refresh',
+                     'expires_in': 3600, 'token_type': 'bearer', 'scope': None,
+                     'account_username': 'user'}
@@ -17,59 +17,177 @@
 Helper functions for PyImgur
 
 Main purpose is to provide a combined spot to send, parse and check requests to
-imgur. Also converts lists to the format needed by imgur.
+imgur, over connections that are kept open and reused. Also converts lists to
+the format needed by imgur.
 """
 
 import json
+import os
+import re
+import sys
+import threading
 import urllib
+import uuid
 from sys import version_info
 if version_info < (3, 0):
     from urllib import urlencode
 else:
-    from urllib.parse import urlenocode
+    from urllib.parse import urlencode
 
 import requests
+import six
+from requests.adapters import HTTPAdapter
 
 import pyimgur
 
-def _request(url, payload={}, method="GET", force_client=False):
-    if force_client or (pyimgur._client and
-                        pyimgur._client.token is not None):
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def create_session(pool_maxsize=10, pool_connections=10):
+    """
+    Return a requests.Session that keeps connections open for reuse.
+
+    The session can be shared by many Imgur clients and threads, as the
+    clients send their credentials with each request. `pool_maxsize` is the
+    number of connections kept open to each host, so set it to the number
+    of threads sending requests at once. `pool_connections` is the number
+    of hosts connections are kept for.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _get_shared_session():
+    """Return the session used by the module level functions."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+def _request(url, payload=None, method="GET", force_client=False):
+    payload = payload or {}
+    client = getattr(pyimgur, '_client', None)
+    if force_client or (client and client.token is not None):
         payload = urlencode(payload)
         if method == 'GET':
-            response, content = pyimgur._client.request(url + "?" + payload)
+            response, content = client.request(url + "?" + payload)
         else:
-            response, content = pyimgur._client.request(url, body=payload,
-                                                              method=method)
-        _test_response(int(response['status']), response, content)
+            response, content = client.request(url, body=payload,
+                                               method=method)
+        _test_response(method, url, int(response['status']), content)
         if response['content-type'] == 'application/json':
             content = json.loads(content)
         else:
             content = dict(x.split('=') for x in content.split('&'))
     else:
+        session = _get_shared_session()
         if method == 'GET':
-            r = requests.get(url, params=payload)
+            r = session.get(url, params=payload)
         elif method == 'POST':
-            r = requests.post(url, payload)
+            r = session.post(url, payload)
         elif method == 'DELETE':
-            r = requests.delete(url)
-        _test_response(r)
+            r = session.delete(url)
+        _test_response(method, url, r.status_code, r.content)
         content = json.loads(r.content)
 
     return content
 
-def _test_response(r):
+def _test_response(method, url, status_code, content):
     """
     Test if everything is okay.
 
-    If everything isn't okay, call the appropriate error code.
+    If everything isn't okay, raise an ImgurError.
     """
-    if r.status_code != 200:
-        pyimgur.errors.raise_error(r.status_code, r.json())
+    if status_code != 200:
+        error = content
+        msg = "Error doing %s on url: %s. Code: %d" % (method, url, status_code)
+        try:
+            if 'error' in json.loads(content)['data']:
+                # ImgurError makes its message from the error of Imgur
+                error, msg = json.loads(content), None
+        except (ValueError, KeyError, TypeError):
+            pass
+        raise pyimgur.errors.ImgurError(method, url, status_code, error, msg)
     elif content == '':
         error_message = ("Malformed json returned from Imgur. "
                          "Status_code: %d" % status_code)
-        raise pyimgur.errors.imgurapiError(error_message)
+        raise pyimgur.errors.ImgurError(method, url, status_code, None, error_message)
+
+_JSON_SPECIAL = re.compile(r'[\[\]{},"\\]')
+
+
+def _iter_json_items(chunks, key, loads=json.loads):
+    """
+    Yield the items of the array under `key` in a JSON object.
+
+    `chunks` is an iterable of pieces of the JSON text, like
+    response.iter_content(). Every item is parsed with `loads` as soon as all
+    of its text has arrived, and only the text of the item being read is kept.
+    """
+    buf = ''
+    depth = 0
+    in_string = in_items = False
+    last_string = string_start = item_start = skip = None
+    for chunk in chunks:
+        offset = len(buf)
+        buf += chunk
+        for match in _JSON_SPECIAL.finditer(buf, offset):
+            i = match.start()
+            char = buf[i]
+            if i == skip:  # Escaped by a backslash
+                continue
+            if in_string:
+                if char == '\\':
+                    skip = i + 1
+                elif char == '"':
+                    in_string = False
+                    if depth == 1:
+                        last_string = buf[string_start + 1:i]
+            elif char == '"':
+                in_string = True
+                string_start = i
+            elif char in '[{':
+                if char == '[' and depth == 1 and last_string == key and item_start is None:
+                    in_items = True
+                    item_start = i + 1
+                depth += 1
+            elif in_items and depth == 2 and char in ',]':
+                item = buf[item_start:i].strip()
+                if item:
+                    yield loads(item)
+                if char == ']':
+                    return
+                item_start = i + 1
+            elif char in ']}':
+                depth -= 1
+
+        # Drop the text that has been dealt with
+        keep = len(buf)
+        if in_items:
+            keep = item_start
+        elif in_string:
+            keep = string_start
+        buf = buf[keep:]
+        if item_start is not None:
+            item_start -= keep
+        if string_start is not None:
+            string_start -= keep
+        if skip is not None:
+            skip -= keep
+
+
+def _project(item, fields):
+    """Return a dict with only `fields` from item, or item if fields is empty."""
+    if not fields:
+        return item
+    return dict((field, item.get(field)) for field in fields)
+
 
 def _to_imgur_list(ids):
     """
@@ -80,3 +198,153 @@ def _to_imgur_list(ids):
     if not ids:
         return ''
     return '(' + ",".join("''" if i == '' else i for i in ids) + ')'
+
+
+class _MultipartStream(object):
+    """
+    A multipart/form-data body that is read from a file as it's sent.
+
+    Only one chunk of the file is held in memory at a time, so memory use
+    doesn't depend on the file size. Pass it as the request body together
+    with `content_type` as the Content-Type header.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fields, file_field, file_obj, filename=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self._file = file_obj
+        self._file_start = file_obj.tell()
+        file_size = os.fstat(file_obj.fileno()).st_size - self._file_start
+        filename = filename or os.path.basename(getattr(file_obj, 'name', file_field))
+
+        head = []
+        for name, value in sorted(fields.items()):
+            head.append('--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n'
+                        % (self.boundary, name, _to_bytes(value)))
+        head.append('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                    'Content-Type: application/octet-stream\r\n\r\n'
+                    % (self.boundary, file_field, _to_bytes(filename)))
+        self._head = ''.join(head)
+        self._tail = '\r\n--%s--\r\n' % self.boundary
+        self._length = len(self._head) + file_size + len(self._tail)
+        self._position = 0
+
+    def __len__(self):
+        return self._length - self._position
+
+    def __iter__(self):
+        chunk = self.read(self.CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = self.read(self.CHUNK_SIZE)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        """Rewind the stream. Only seeking to the start is supported."""
+        if offset != 0 or whence != 0:
+            raise IOError('_MultipartStream can only be rewound to the start')
+        self._position = 0
+        self._file.seek(self._file_start)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._position < self._length:
+            chunk = self._read_part(size)
+            self._position += len(chunk)
+            size -= len(chunk)
+            chunks.append(chunk)
+        return ''.join(chunks)
+
+    def _read_part(self, size):
+        head_size = len(self._head)
+        tail_start = self._length - len(self._tail)
+        if self._position < head_size:
+            return self._head[self._position:self._position + size]
+        if self._position < tail_start:
+            chunk = self._file.read(min(size, tail_start - self._position))
+            if not chunk:
+                raise IOError('File shrank while being uploaded')
+            return chunk
+        offset = self._position - tail_start
+        return self._tail[offset:offset + size]
+
+
+def _to_bytes(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+class _ByteBudget(object):
+    """
+    Limit the number of bytes in flight between threads.
+
+    `acquire` blocks until `size` bytes fit in the budget. A single item
+    bigger than the whole budget is let through once nothing else is in
+    flight, so it can't block forever. Once the budget is closed, `acquire`
+    returns False instead of waiting.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, size):
+        with self._cond:
+            while not self.closed and self.in_flight and self.in_flight + size > self.max_bytes:
+                self._cond.wait()
+            if self.closed:
+                return False
+            self.in_flight += size
+            return True
+
+    def release(self, size):
+        with self._cond:
+            self.in_flight -= size
+            self._cond.notify_all()
+
+    def close(self):
+        """Wake up the threads waiting in `acquire`, and turn them away."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class _SingleFlight(object):
+    """
+    Run a function once for callers that ask for the same key at once.
+
+    The first caller runs the function. Callers that arrive while it runs
+    wait for it, and get the same result or exception.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                six.reraise(*call['error'])
+            return call['result']
+        try:
+            call['result'] = function()
+            return call['result']
+        except:
+            call['error'] = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
@@ -0,0 +1,201 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+A local index of the images, albums and accounts a client has fetched.
+
+An Index given to an Imgur client stores every image, album and account in
+the responses of request_json in an SQLite database, including the images
+of albums and the items of listings walked with get_content, unless they
+are streamed. They are kept by id, with the account they belong to, their
+datetime, views and the albums they are in, so they can be queried later
+without asking Imgur:
+
+    index = Index('imgur.db')
+    imgur = pyimgur.Imgur(client_id, client_secret, index=index)
+    list(imgur.get_account_albums(limit=None))
+    popular = index.album_images('abc123', min_views=1000)
+
+The queries return the dicts the API returned, which can be turned into
+objects with Image.from_api_response and the like.
+'''
+
+import json
+import sqlite3
+import threading
+import time
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    id TEXT PRIMARY KEY, account TEXT, datetime INTEGER, views INTEGER,
+    fetched_at REAL NOT NULL, json TEXT NOT NULL, deletehash TEXT);
+CREATE INDEX IF NOT EXISTS images_account ON images (account, datetime);
+CREATE INDEX IF NOT EXISTS images_datetime ON images (datetime);
+CREATE TABLE IF NOT EXISTS albums (
+    id TEXT PRIMARY KEY, account TEXT, datetime INTEGER, views INTEGER,
+    fetched_at REAL NOT NULL, json TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS albums_account ON albums (account, datetime);
+CREATE INDEX IF NOT EXISTS albums_datetime ON albums (datetime);
+CREATE TABLE IF NOT EXISTS album_images (
+    album_id TEXT NOT NULL, image_id TEXT NOT NULL, position INTEGER NOT NULL,
+    PRIMARY KEY (album_id, image_id));
+CREATE INDEX IF NOT EXISTS album_images_image ON album_images (image_id);
+CREATE TABLE IF NOT EXISTS accounts (
+    username TEXT PRIMARY KEY, fetched_at REAL NOT NULL, json TEXT NOT NULL);
+'''
+
+# Run once the columns added since the first version exist
+_INDEXES = '''
+CREATE INDEX IF NOT EXISTS images_deletehash ON images (deletehash);
+'''
+
+
+class Index(object):
+    """Images, albums and accounts kept in an SQLite database."""
+
+    # The endpoints whose responses are accounts
+    ACCOUNT_ENDPOINTS = frozenset(['account'])
+
+    def __init__(self, path=':memory:'):
+        """Create a new Index, stored in the database file at `path`. It's
+        created if it doesn't exist. By default the index is only kept in
+        memory."""
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+            columns = [row[1] for row in self._db.execute('PRAGMA table_info(images)')]
+            if 'deletehash' not in columns:  # Made before deletehashes were kept
+                self._db.execute('ALTER TABLE images ADD COLUMN deletehash TEXT')
+            self._db.executescript(_INDEXES)
+
+    def close(self):
+        self._db.close()
+
+    def store(self, endpoint, type, data):
+        """Store what a response of `endpoint` holds.
+
+        :param type: the name of the class request_json was asked to turn
+            the data into, if any.
+        :param data: the 'data' of the response, a dict or a list of them.
+        """
+        items = data if isinstance(data, list) else [data]
+        now = time.time()
+        with self._lock:
+            with self._db:  # One transaction
+                for item in items:
+                    if not isinstance(item, dict) or 'id' not in item:
+                        continue
+                    if endpoint in self.ACCOUNT_ENDPOINTS and 'url' in item:
+                        self._db.execute('INSERT OR REPLACE INTO accounts VALUES (?, ?, ?)',
+                                         (item['url'], now, json.dumps(item)))
+                    elif type == 'Album' or item.get('is_album') or 'images_count' in item:
+                        self._store_album(item, now)
+                    elif type == 'Image' or 'link' in item:
+                        self._store_image(item, now)
+
+    def _store_image(self, image, now):
+        self._db.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (image['id'], image.get('account_url'), image.get('datetime'), image.get('views'),
+                          now, json.dumps(image), image.get('deletehash')))
+
+    def _store_album(self, album, now):
+        self._db.execute('INSERT OR REPLACE INTO albums VALUES (?, ?, ?, ?, ?, ?)',
+                         (album['id'], album.get('account_url'), album.get('datetime'), album.get('views'),
+                          now, json.dumps(album)))
+        # Listings leave the images of albums out, keep what we know then
+        if album.get('images') is not None:
+            self._db.execute('DELETE FROM album_images WHERE album_id = ?', (album['id'],))
+            for position, image in enumerate(album['images']):
+                self._store_image(image, now)
+                self._db.execute('INSERT OR REPLACE INTO album_images VALUES (?, ?, ?)',
+                                 (album['id'], image['id'], position))
+
+    def delete_image(self, id):
+        """Forget the image with this id or deletehash."""
+        with self._lock:
+            with self._db:
+                ids = [row[0] for row in self._db.execute(
+                    'SELECT id FROM images WHERE id = ? OR deletehash = ?', (id, id))]
+                for image_id in ids or [id]:
+                    self._db.execute('DELETE FROM images WHERE id = ?', (image_id,))
+                    self._db.execute('DELETE FROM album_images WHERE image_id = ?', (image_id,))
+
+    def _query(self, sql, args):
+        with self._lock:
+            return [json.loads(row[0]) for row in self._db.execute(sql, args)]
+
+    def _one(self, sql, args):
+        rows = self._query(sql, args)
+        return rows[0] if rows else None
+
+    def _filter(self, table, account, since, until, min_views, limit):
+        clauses, args = [], []
+        for clause, value in [('account = ?', account), ('datetime >= ?', since),
+                              ('datetime < ?', until), ('views >= ?', min_views)]:
+            if value is not None:
+                clauses.append(clause)
+                args.append(value)
+        sql = 'SELECT json FROM %s' % table
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY datetime DESC'
+        if limit is not None:
+            sql += ' LIMIT %d' % limit
+        return self._query(sql, args)
+
+    def get_image(self, id):
+        """Return the image with this id, or None if it isn't indexed."""
+        return self._one('SELECT json FROM images WHERE id = ?', (id,))
+
+    def get_album(self, id):
+        """Return the album with this id, or None if it isn't indexed."""
+        return self._one('SELECT json FROM albums WHERE id = ?', (id,))
+
+    def get_account(self, username):
+        """Return the account called `username`, or None if it isn't indexed."""
+        return self._one('SELECT json FROM accounts WHERE username = ?', (username,))
+
+    def images(self, account=None, since=None, until=None, min_views=None, limit=None):
+        """Return the indexed images matching all of the given conditions,
+        newest first.
+
+        :param account: the username of the account they belong to.
+        :param since: the oldest datetime, as a Unix time.
+        :param until: the datetime they must be older than.
+        :param min_views: the fewest views they must have.
+        """
+        return self._filter('images', account, since, until, min_views, limit)
+
+    def albums(self, account=None, since=None, until=None, min_views=None, limit=None):
+        """Return the indexed albums matching all of the given conditions,
+        newest first. The conditions are the ones of images."""
+        return self._filter('albums', account, since, until, min_views, limit)
+
+    def album_images(self, album_id, min_views=None):
+        """Return the images of an album, in their order in the album."""
+        sql = ('SELECT images.json FROM album_images JOIN images ON images.id = album_images.image_id '
+               'WHERE album_images.album_id = ?')
+        args = [album_id]
+        if min_views is not None:
+            sql += ' AND images.views >= ?'
+            args.append(min_views)
+        return self._query(sql + ' ORDER BY album_images.position', args)
+
+    def image_albums(self, image_id):
+        """Return the indexed albums an image is in."""
+        return self._query('SELECT albums.json FROM album_images JOIN albums ON albums.id = album_images.album_id '
+                           'WHERE album_images.image_id = ?', (image_id,))
@@ -0,0 +1,167 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Metrics about the requests a client makes.
+
+An Imgur client given metrics hooks reports every request it sends, and
+every response it answers from its cache, to each of them as a
+RequestEvent. A hook is any object with a record(event) method. Two are
+included: PrometheusExporter, which keeps totals and renders them in the
+Prometheus text format, and StatsdExporter, which sends every event to a
+StatsD server. Without hooks, nothing is measured.
+'''
+
+import collections
+import socket
+import threading
+
+
+class RequestEvent(object):
+    """What happened to one request.
+
+    endpoint is the name of the API path in Config.API_PATHS, or None for
+    other urls. total is the number of seconds from the first attempt to the
+    last response, including retries and rate limiting, and ttfb the number
+    of seconds the last attempt took until its headers arrived. When the
+    request was answered from the cache, cache_hit is True and nothing was
+    sent. error is the exception that kept the request from getting a
+    response, if any.
+    """
+    __slots__ = ('endpoint', 'method', 'status', 'total', 'ttfb', 'bytes_sent', 'bytes_received',
+                 'retries', 'cache_hit', 'error')
+
+    def __init__(self, endpoint, method, status=None, total=0.0, ttfb=None, bytes_sent=0,
+                 bytes_received=0, retries=0, cache_hit=False, error=None):
+        self.endpoint = endpoint
+        self.method = method.upper()
+        self.status = status
+        self.total = total
+        self.ttfb = ttfb
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.retries = retries
+        self.cache_hit = cache_hit
+        self.error = error
+
+    def __repr__(self):
+        return 'RequestEvent(%s)' % ', '.join('%s=%r' % (name, getattr(self, name))
+                                            for name in self.__slots__)
+
+
+class PrometheusExporter(object):
+    """Keep totals of the events, to be scraped by Prometheus."""
+
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, namespace='pyimgur', buckets=BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self._counters = collections.defaultdict(float)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        endpoint = event.endpoint or 'other'
+        with self._lock:
+            if event.cache_hit:
+                self._counters[('cache_hits_total', (('endpoint', endpoint),))] += 1
+                return
+            labels = (('endpoint', endpoint), ('method', event.method),
+                      ('status', str(event.status or type(event.error).__name__)))
+            self._counters[('requests_total', labels)] += 1
+            self._counters[('retries_total', labels[:2])] += event.retries
+            self._counters[('sent_bytes_total', labels[:2])] += event.bytes_sent
+            self._counters[('received_bytes_total', labels[:2])] += event.bytes_received
+            self._observe('request_duration_seconds', labels[:2], event.total)
+            if event.ttfb is not None:
+                self._observe('time_to_first_byte_seconds', labels[:2], event.ttfb)
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        if key not in self._histograms:
+            self._histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+        counts, _, _ = histogram = self._histograms[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        histogram[1] += 1
+        histogram[2] += value
+
+    def _line(self, name, labels, value):
+        label_text = ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                              for k, v in labels)
+        return '%s_%s{%s} %s' % (self.namespace, name, label_text, repr(float(value)))
+
+    def render(self):
+        """Return the totals in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            names = sorted(set(name for name, _ in self._counters))
+            for name in names:
+                lines.append('# TYPE %s_%s counter' % (self.namespace, name))
+                for (key_name, labels), value in sorted(self._counters.items()):
+                    if key_name == name:
+                        lines.append(self._line(name, labels, value))
+            names = sorted(set(name for name, _ in self._histograms))
+            for name in names:
+                lines.append('# TYPE %s_%s histogram' % (self.namespace, name))
+                for (key_name, labels), (counts, count, total) in sorted(self._histograms.items()):
+                    if key_name != name:
+                        continue
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        lines.append(self._line(name + '_bucket', labels + (('le', repr(float(bound))),),
+                                                bucket_count))
+                    lines.append(self._line(name + '_bucket', labels + (('le', '+Inf'),), count))
+                    lines.append(self._line(name + '_count', labels, count))
+                    lines.append(self._line(name + '_sum', labels, total))
+        return '\n'.join(lines) + '\n'
+
+
+class StatsdExporter(object):
+    """Send every event to a StatsD server, over UDP."""
+
+    def __init__(self, host='localhost', port=8125, prefix='pyimgur'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def record(self, event):
+        name = '%s.%s' % (self.prefix, event.endpoint or 'other')
+        if event.cache_hit:
+            self.send(['%s.cache_hits:1|c' % name])
+            return
+        status = event.status or type(event.error).__name__
+        lines = ['%s.requests:1|c' % name,
+                 '%s.status.%s:1|c' % (name, status),
+                 '%s.duration:%d|ms' % (name, event.total * 1000),
+                 '%s.sent_bytes:%d|c' % (name, event.bytes_sent),
+                 '%s.received_bytes:%d|c' % (name, event.bytes_received)]
+        if event.ttfb is not None:
+            lines.append('%s.ttfb:%d|ms' % (name, event.ttfb * 1000))
+        if event.retries:
+            lines.append('%s.retries:%d|c' % (name, event.retries))
+        self.send(lines)
+
+    def send(self, lines):
+        """Send the metrics in `lines` in one packet. Errors are ignored,
+        like StatsD itself would."""
+        try:
+            self._socket.sendto('\n'.join(lines).encode('utf-8'), self.address)
+        except (socket.error, socket.gaierror):
+            pass
+
+    def close(self):
+        self._socket.close()
@@ -1,28 +1,152 @@
+import threading
+
 import six
 from pyimgur.errors import AccessDeniedError
 
+# The threads fetching lazy objects, by the id() of the object. Other
+# threads reading the same object wait on _fetch_done for the fetch to end.
+_fetching = {}
+_fetch_done = threading.Condition()
+
 __author__ = 'malakar'
 
 
 class ImgurObject(object):
+    """An object returned by the API.
+
+    The fields the API is known to return for a type are listed in the
+    `__slots__` of its class, so objects don't need a __dict__. Any other
+    attribute, including fields renamed by `underscore_names`, is kept in
+    the `_extra` dict and read and written like a normal attribute. The
+    dict is only created for objects that need it.
+
+    Lazy objects keep the dict returned by the API and copy a field to its
+    attribute the first time it's read. If they were created without a
+    dict, the API is only asked for it when an attribute that isn't set is
+    read, so creating them costs nothing.
+    """
+    __slots__ = ('imgur_session', '_underscore_names', '_populated', '_extra', '_raw')
 
     @classmethod
     def from_api_response(cls, imgur_session, json_dict):
         """Return an instance of the appropriate class from the json_dict."""
-        return cls(imgur_session, json_dict=json_dict)
+        return cls(imgur_session, json_dict=json_dict, lazy=getattr(imgur_session, 'lazy_objects', False))
 
-    def __init__(self, imgur_session, json_dict=None, fetch=True, underscore_names=None):
+    def __init__(self, imgur_session, json_dict=None, fetch=True, underscore_names=None, lazy=False):
         """Create a new object from the dict of attributes returned by the API.
 
         The fetch parameter specifies whether to retrieve the object's
         information from the API (only matters when it isn't provided using
-        json_dict).
+        json_dict). For lazy objects the information is retrieved when an
+        unknown attribute is first read, instead of now.
 
         """
 
         self.imgur_session = imgur_session
         self._underscore_names = underscore_names
-        self._populated = self._populate(json_dict, fetch)
+        if lazy:
+            if json_dict is None and not fetch:
+                json_dict = {}
+            self._raw = self._as_dict(json_dict)
+            self._populated = bool(json_dict) or fetch
+        else:
+            self._populated = self._populate(json_dict, fetch)
+
+    def __getattr__(self, name):
+        # Only called when name isn't a set slot or a class attribute
+        if name.startswith('__') or name in ImgurObject.__slots__:
+            raise AttributeError(name)
+        try:
+            return self._extra[name]
+        except (AttributeError, KeyError):
+            pass
+        try:
+            raw = self._raw
+        except AttributeError:  # Not a lazy object
+            raw = {}
+        if raw is None:
+            raw = self._fetch_raw()
+        key = self._api_name(name)
+        if key in raw:
+            value = raw[key]
+            setattr(self, name, value)
+            return value
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            # Not a slot. _extra is only created when it's first needed.
+            try:
+                extra = object.__getattribute__(self, '_extra')
+            except AttributeError:
+                extra = {}
+                object.__setattr__(self, '_extra', extra)
+            extra[name] = value
+
+    def __delattr__(self, name):
+        try:
+            object.__delattr__(self, name)
+        except AttributeError:
+            try:
+                del self._extra[name]
+            except (AttributeError, KeyError):
+                raise AttributeError(name)
+
+    def __getstate__(self):
+        # Slotted objects have no __dict__ for pickle to save
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                try:
+                    state[name] = object.__getattribute__(self, name)
+                except AttributeError:  # Not set
+                    pass
+        return state
+
+    def __setstate__(self, state):
+        for name, value in six.iteritems(state):
+            object.__setattr__(self, name, value)
+
+    def _fetch_raw(self):
+        me = threading.current_thread()
+        with _fetch_done:
+            while id(self) in _fetching:
+                if _fetching[id(self)] is me:
+                    # Reading self.url in _get_json_dict must not start
+                    # another fetch
+                    return {}
+                _fetch_done.wait()
+            if self._raw is not None:  # Fetched by another thread
+                return self._raw
+            _fetching[id(self)] = me
+        raw = None
+        try:
+            raw = self._as_dict(self._get_json_dict())
+        finally:
+            with _fetch_done:
+                del _fetching[id(self)]
+                if raw is not None:
+                    self._raw = raw
+                _fetch_done.notify_all()
+        return raw
+
+    def _api_name(self, name):
+        """Return the key of attribute `name` in the dict returned by the API."""
+        underscore_names = self._underscore_names
+        if underscore_names:
+            if name.startswith('_') and name[1:] in underscore_names:
+                return name[1:]
+            if name in underscore_names:
+                return None
+        return name
+
+    @staticmethod
+    def _as_dict(json_dict):
+        if isinstance(json_dict, list):
+            return {'_tmp': json_dict}
+        return json_dict
 
     def _get_json_dict(self):
         response = self.imgur_session.request_json(self.url, type=self.__class__,
@@ -36,8 +160,7 @@ class ImgurObject(object):
             else:
                 json_dict = {}
 
-        if isinstance(json_dict, list):
-            json_dict = {'_tmp': json_dict}
+        json_dict = self._as_dict(json_dict)
 
         for name, value in six.iteritems(json_dict):
             if self._underscore_names and name in self._underscore_names:
@@ -47,11 +170,15 @@ class ImgurObject(object):
 
 
 class Image(ImgurObject):
+    __slots__ = ('id', 'title', 'description', 'datetime', 'type', 'animated', 'width', 'height', 'size', 'views',
+                 'bandwidth', 'deletehash', 'name', 'section', 'link', 'gifv', 'mp4', 'mp4_size', 'looping',
+                 'favorite', 'nsfw', 'vote', 'in_gallery', 'account_url', 'account_id', 'is_album')
+
     def delete(self):
-        self.imgur_session.delete_image(self._get_id())
+        self.imgur_session.delete_image(self._get_id(), image_id=self.id)
 
     def update_img_info(self,  title=None, description=None):
-        self.imgur_session.update_img_info(self._get_id(), title, description)
+        self.imgur_session.update_img_info(self._get_id(), title, description, image_id=self.id)
 
     def fav(self):
         self.imgur_session.fav_image(self.id)
@@ -71,10 +198,12 @@ class Image(ImgurObject):
 
 
 class Account(ImgurObject):
-    def __init__(self, imgur_session, url=None, json_dict=None, fetch=True):
+    __slots__ = ('url', 'id', 'bio', 'reputation', 'created', 'pro_expiration')
+
+    def __init__(self, imgur_session, url=None, json_dict=None, fetch=True, lazy=False):
         if url is not None:
             self.url = url
-        super(Account, self).__init__(imgur_session, json_dict, fetch)
+        super(Account, self).__init__(imgur_session, json_dict, fetch, lazy=lazy)
 
     def delete(self):
         pass
@@ -172,19 +301,24 @@ class Account(ImgurObject):
 
 
 class AccountStats(ImgurObject):
-    pass
+    __slots__ = ('total_images', 'total_albums', 'disk_used', 'bandwidth_used', 'top_images', 'top_albums',
+                 'top_gallery_comments')
 
 class GalleryProfile(ImgurObject):
-    pass
+    __slots__ = ('total_gallery_comments', 'total_gallery_favorites', 'total_gallery_submissions', 'trophies')
 
 class Comment(ImgurObject):
+    # A slot can't share its name with a method, so voting is cast_vote
+    __slots__ = ('id', 'image_id', 'comment', 'author', 'author_id', 'on_album', 'album_cover', 'ups', 'downs',
+                 'points', 'datetime', 'parent_id', 'deleted', 'children', 'vote')
+
     def delete(self):
         pass
 
     def get_replies(self):
         pass
 
-    def vote(self):
+    def cast_vote(self):
         pass
 
     def report(self):
@@ -195,6 +329,10 @@ class Comment(ImgurObject):
 
 
 class Album(ImgurObject):
+    __slots__ = ('id', 'title', 'description', 'datetime', 'cover', 'cover_width', 'cover_height', 'account_url',
+                 'account_id', 'privacy', 'layout', 'views', 'link', 'favorite', 'nsfw', 'section', 'order',
+                 'deletehash', 'images_count', 'images', 'in_gallery', 'is_album')
+
     def create(self):
         pass
 
@@ -224,21 +362,25 @@ class Album(ImgurObject):
 
 
 class Favable(Album):
+    __slots__ = ()
 
     @classmethod
     def from_api_response(cls, imgur_session, json_dict):
         """Return an instance of the appropriate class from the json_dict."""
         if json_dict['is_album']:
-            return Album(imgur_session, json_dict=json_dict)
+            return Album.from_api_response(imgur_session, json_dict)
         else:
-            return Image(imgur_session, json_dict=json_dict)
+            return Image.from_api_response(imgur_session, json_dict)
 
 
 class Notification(ImgurObject):
-    pass
+    __slots__ = ('id', 'account_id', 'viewed', 'content')
 
 
 class Gallery(ImgurObject):
-    pass
+    __slots__ = ()
 
 
+#: The classes request_json can turn API responses into, by name.
+OBJECT_TYPES = dict((cls.__name__, cls) for cls in (
+    Image, Account, AccountStats, GalleryProfile, Comment, Album, Favable, Notification, Gallery))
@@ -0,0 +1,144 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Client side rate limiting.
+
+Imgur gives every application a daily number of credits, and every user an
+hourly number. Uploads have their own hourly limit. The remaining credits are
+sent with every response, and are available from the credits endpoint. A
+RateLimiter keeps track of them like a token bucket: requests are sent right
+away, in bursts if need be, as long as credits are left, and only once they
+run out does it hold requests back until the credits are reset, instead of
+running into 429 errors. One RateLimiter can be shared by many clients and
+threads.
+
+See http://api.imgur.com/#limits
+'''
+
+import threading
+import time
+
+
+class Budget(object):
+    """The credits left for one limit, and when they are reset."""
+
+    def __init__(self, limit=None, remaining=None, reset=None):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset  # Unix time, or None if unknown
+        self.borrowed = 0  # Credits taken from after the reset
+
+    def reserve(self, now, reserve):
+        """Take a credit, and return the number of seconds to wait before
+        the request using it can be sent."""
+        if self.remaining is None:
+            return 0
+        if self.reset is not None and now >= self.reset:
+            # The credits have been reset since we last heard
+            self.remaining = max(self.limit - self.borrowed, 0) if self.limit is not None else None
+            self.reset = None
+            self.borrowed = 0
+            if self.remaining is None:
+                return 0
+        if self.remaining > reserve or self.reset is None:
+            # Credits are left, or there is no reset to wait for
+            self.remaining = max(self.remaining - 1, 0)
+            return 0
+        # The bucket is empty, wait until it is filled again
+        self.borrowed += 1
+        return self.reset - now
+
+    def to_dict(self):
+        return {'limit': self.limit, 'remaining': self.remaining, 'reset': self.reset}
+
+
+class RateLimiter(object):
+    """Pace requests so they stay within the Imgur credits."""
+
+    def __init__(self, reserve=0, sleep=time.sleep, clock=time.time):
+        """Create a new RateLimiter.
+
+        :param reserve: the number of credits of each limit to leave
+            unused, as a safety margin.
+        """
+        self.reserve = reserve
+        self._sleep = sleep
+        self._clock = clock
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, key):
+        if key not in self._budgets:
+            self._budgets[key] = Budget()
+        return self._budgets[key]
+
+    def _keys(self, client_id, user, method):
+        keys = [('client', client_id), ('user', client_id, user)]
+        if method.upper() == 'POST':
+            keys.append(('post', client_id, user))
+        return keys
+
+    def acquire(self, client_id, user=None, method='GET'):
+        """Block until a request may be sent without going over the limits.
+
+        :param client_id: the id of the application sending the request
+        :param user: the access token of the user, or None if anonymous
+        """
+        with self._lock:
+            now = self._clock()
+            wait = max(self._budget(key).reserve(now, self.reserve)
+                       for key in self._keys(client_id, user, method))
+        if wait > 0:
+            self._sleep(wait)
+
+    def update(self, client_id, user, headers):
+        """Update the credits from the X-RateLimit headers of a response."""
+        now = self._clock()
+        with self._lock:
+            self._set(('client', client_id), headers.get('X-RateLimit-ClientLimit'),
+                      headers.get('X-RateLimit-ClientRemaining'), None)
+            self._set(('user', client_id, user), headers.get('X-RateLimit-UserLimit'),
+                      headers.get('X-RateLimit-UserRemaining'), headers.get('X-RateLimit-UserReset'))
+            post_reset = headers.get('X-Post-Rate-Limit-Reset')  # Seconds from now
+            self._set(('post', client_id, user), headers.get('X-Post-Rate-Limit-Limit'),
+                      headers.get('X-Post-Rate-Limit-Remaining'),
+                      now + int(post_reset) if post_reset is not None else None)
+
+    def update_from_credits(self, client_id, user, credits):
+        """Update the credits from the data of the credits endpoint."""
+        with self._lock:
+            self._set(('client', client_id), credits.get('ClientLimit'), credits.get('ClientRemaining'), None)
+            self._set(('user', client_id, user), credits.get('UserLimit'), credits.get('UserRemaining'),
+                      credits.get('UserReset'))
+
+    def _set(self, key, limit, remaining, reset):
+        if remaining is None:
+            return
+        budget = self._budget(key)
+        budget.remaining = int(remaining)
+        budget.borrowed = 0
+        if limit is not None:
+            budget.limit = int(limit)
+        if reset is not None:
+            budget.reset = int(reset)
+
+    def remaining(self, client_id, user=None):
+        """Return the credits known to be left, as a dict of 'client',
+        'user' and 'post' to dicts with the limit, remaining credits and
+        reset time."""
+        with self._lock:
+            return dict((key[0], self._budgets.get(key, Budget()).to_dict())
+                        for key in self._keys(client_id, user, 'POST'))
@@ -0,0 +1,97 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Retrying failed requests.
+
+A RetryPolicy given to an Imgur client makes it send a request again when it
+fails with a connection error or a status like 503, waiting a little longer
+after every attempt. Only requests that are safe to repeat are retried: GET,
+HEAD, PUT, DELETE and OPTIONS, and POST requests explicitly marked as
+idempotent, like uploads made with idempotent=True. As every request is
+retried on its own, a get_content walk carries on from the page that failed.
+'''
+
+import random
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+
+class RetryPolicy(object):
+    """When to retry a failed request, and how long to wait before it."""
+
+    IDEMPOTENT_METHODS = frozenset(['get', 'head', 'put', 'delete', 'options'])
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30, deadline=None,
+                 statuses=(429, 500, 502, 503, 504), sleep=time.sleep, clock=time.time):
+        """Create a new RetryPolicy.
+
+        :param max_retries: the number of times a request is sent again.
+        :param backoff: the wait before the first retry, in seconds. It
+            doubles with each retry, up to `max_backoff`. The actual wait is
+            a random time up to that, so clients that failed together don't
+            retry together.
+        :param deadline: the number of seconds after which a request is not
+            retried anymore, counted from when it was first sent.
+        :param statuses: the HTTP status codes that are retried.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.statuses = frozenset(statuses)
+        self.sleep = sleep
+        self.clock = clock
+
+    def can_retry(self, method, idempotent):
+        """Return whether a request may be sent more than once."""
+        if idempotent is not None:
+            return idempotent
+        return method.lower() in self.IDEMPOTENT_METHODS
+
+    def delay(self, attempt, retry_after=None):
+        """Return how long to wait before retry number `attempt`, starting at
+        0. `retry_after` is the value of the Retry-After header, if any."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        server_delay = _parse_retry_after(retry_after, self.clock())
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        return delay
+
+    def wait(self, attempt, started, retry_after=None):
+        """Wait before retry number `attempt` of a request first sent at
+        `started`. Return False, without waiting, if it should not be
+        retried anymore."""
+        if attempt >= self.max_retries:
+            return False
+        delay = self.delay(attempt, retry_after)
+        if self.deadline is not None and self.clock() + delay - started > self.deadline:
+            return False
+        self.sleep(delay)
+        return True
+
+
+def _parse_retry_after(value, now):
+    """Return the seconds to wait from a Retry-After header, which is either
+    a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(mktime_tz(parsed) - now, 0)
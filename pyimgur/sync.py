@@ -0,0 +1,149 @@
+# This file is part of PyImgur.
+
+# PyImgur is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# PyImgur is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PyImgur.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Keeping a local copy of an account's listings up to date.
+
+A Syncer walks the albums or submissions of an account and compares them
+with a SyncState, which remembers the id, datetime and views of every item
+seen before, and the newest datetime seen: the high-water mark. It yields a
+SyncRecord for every item that was added or changed since the last sync.
+
+The listings are sorted newest first, so an incremental sync stops paging
+at the first item older than the high-water mark. Items further down the
+listing aren't checked, so their changes, and items that were removed, are
+only found by a full sync, which walks the whole listing. Running a full
+sync now and then, and incremental ones in between, keeps the state
+complete without walking everything every time:
+
+    state = SyncState.load(path) if os.path.exists(path) else SyncState()
+    for record in Syncer(imgur, state).sync('albums'):
+        handle(record)
+    state.save(path)
+'''
+
+import collections
+import json
+import os
+import tempfile
+
+class SyncRecord(collections.namedtuple('SyncRecord', 'kind section id item previous')):
+    """A difference found by a sync. kind is 'added', 'changed' or
+    'removed'. item is the item as returned by the API, or None if it was
+    removed, and previous the fields of it the state had, or None if it
+    was added."""
+    __slots__ = ()
+
+
+class SyncState(object):
+    """The items seen by the previous syncs, for every section."""
+
+    def __init__(self, sections=None):
+        # Section name to {'high_water': datetime, 'items': {id: fields}}
+        self.sections = sections or {}
+
+    def section(self, name):
+        if name not in self.sections:
+            self.sections[name] = {'high_water': None, 'items': {}}
+        return self.sections[name]
+
+    def to_dict(self):
+        return {'sections': self.sections}
+
+    @classmethod
+    def from_dict(cls, state_dict):
+        return cls(state_dict['sections'])
+
+    def save(self, path):
+        """Write the state to the file at `path`, replacing it at once."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'w') as state_file:
+            json.dump(self.to_dict(), state_file)
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as state_file:
+            return cls.from_dict(json.load(state_file))
+
+
+class Syncer(object):
+    """Find what changed in the listings of an account since the last sync."""
+
+    # The sections that can be synced, and the config key of their url
+    SECTIONS = {'albums': 'account_albums', 'submissions': 'account_submissions'}
+    TRACKED_FIELDS = ('datetime', 'views')
+
+    def __init__(self, imgur, state, username='me', fields=TRACKED_FIELDS):
+        """Create a new Syncer.
+
+        :param imgur: the client to fetch the listings with.
+        :param state: the SyncState to compare them with. It's updated as
+            the records are yielded.
+        :param fields: the fields of the items that are compared. An item
+            is changed when any of them is.
+        """
+        self.imgur = imgur
+        self.state = state
+        self.username = username
+        self.fields = tuple(fields)
+
+    def sync(self, section, full=False):
+        """A generator method to return a SyncRecord for every item of
+        `section` added or changed since the last sync.
+
+        :param section: 'albums' or 'submissions'.
+        :param full: walk the whole listing, also yielding a record for
+            every item that was removed, instead of stopping at the
+            high-water mark. The first sync of a section is always full.
+        """
+        if section not in self.SECTIONS:
+            raise LookupError('Unknown section: %s' % section)
+        state = self.state.section(section)
+        known = state['items']
+        high_water = state['high_water']
+        full = full or high_water is None
+        url = self.imgur.config[self.SECTIONS[section]] % self.username
+        seen = set()
+        newest = high_water
+        walk = self.imgur.get_content(url, limit=None, raw=True)
+        try:
+            for item in walk:
+                id = item['id']
+                seen.add(id)
+                fields = dict((name, item.get(name)) for name in self.fields)
+                previous = known.get(id)
+                if previous is None:
+                    yield SyncRecord('added', section, id, item, None)
+                elif previous != fields:
+                    yield SyncRecord('changed', section, id, item, previous)
+                # Only remembered once the record was handled, so a sync that
+                # is interrupted yields it again the next time
+                known[id] = fields
+                created = item.get('datetime')
+                if created is not None:
+                    if newest is None or created > newest:
+                        newest = created
+                    if not full and created < high_water:
+                        break  # Everything below was there at the last sync
+        finally:
+            walk.close()
+        if full:
+            for id in [id for id in known if id not in seen]:
+                yield SyncRecord('removed', section, id, None, known[id])
+                del known[id]
+        # Moved up only now, or an interrupted sync would skip the items
+        # it didn't get to
+        state['high_water'] = newest
@@ -20,10 +20,15 @@ Running the test suite takes about 75 seconds.
 """
 
 import filecmp
+import json
 import os
+import time
+import types
 import unittest
 import uuid
 
+import requests
+
 from pyimgur import *
 from pyimgur import auth
 
@@ -332,3 +337,1212 @@ class OAuthTest(unittest.TestCase):
                               consumer_secret=auth.CONSUMER_SECRET,
                               token_key=auth.TOKEN_KEY,
                               token_secret=auth.TOKEN_SECRET)
+
+
+class PagedImgur(Imgur):
+    """An Imgur that serves `pages` from memory instead of the network."""
+    def __init__(self, pages):
+        super(PagedImgur, self).__init__('client_id', 'client_secret')
+        self.pages = pages
+        self.requested = []
+
+    def request_json(self, url, method='GET', data=None, headers=None, client=None, as_objects=True, type=None):
+        self.requested.append(url)
+        page = int(url.rsplit('/', 1)[1])
+        return list(self.pages[page]) if page < len(self.pages) else []
+
+
+class PrefetchTest(unittest.TestCase):
+    def setUp(self):
+        self.i = PagedImgur([range(0, 3), range(3, 6), range(6, 9)])
+
+    def test_prefetch_keeps_order(self):
+        things = list(self.i.get_content('/paged', limit=None, prefetch=4))
+        self.assertEqual(things, range(9))
+
+    def test_prefetch_matches_serial(self):
+        serial = list(self.i.get_content('/paged', limit=None))
+        self.assertEqual(serial, list(self.i.get_content('/paged', limit=None, prefetch=2)))
+
+    def test_prefetch_stops_at_limit(self):
+        things = list(self.i.get_content('/paged', limit=4, prefetch=2))
+        self.assertEqual(things, range(6))
+
+    def test_prefetch_ignored_for_single_page(self):
+        self.assertEqual(list(self.i.get_content('/paged', prefetch=4)), range(3))
+        self.assertEqual(self.i.requested, ['/paged/0'])
+
+
+class AsyncImgurTest(unittest.TestCase):
+    def setUp(self):
+        self.i = AsyncImgur(imgur=PagedImgur([range(0, 3), range(3, 6)]), workers=4)
+
+    def tearDown(self):
+        self.i.close()
+
+    def test_call_returns_result_handle(self):
+        result = self.i.request_json('/paged/1')
+        self.assertEqual(result.get(timeout=5), range(3, 6))
+
+    def test_paginated_method_prefetches(self):
+        self.assertEqual(list(self.i.get_content('/paged', limit=None)), range(6))
+
+    def test_map_keeps_order(self):
+        pages = list(self.i.map('request_json', ['/paged/1', '/paged/0', '/paged/2']))
+        self.assertEqual(pages, [range(3, 6), range(0, 3), []])
+
+    def test_generator_methods_are_not_pooled(self):
+        imgur = Imgur('client_id', 'client_secret')
+        imgur.get_image = lambda id: Image(imgur, json_dict={'id': id}, fetch=False)
+        i = AsyncImgur(imgur=imgur, workers=2)
+        try:
+            results = dict(i.get_images(['a', 'b'], stream=True))
+            self.assertEqual(sorted(image.id for image in results.values()), ['a', 'b'])
+            self.assertEqual(list(i.get_images(['a'], concurrency=1).get(timeout=5)), ['a'])
+            uploads = i.upload_images([], concurrency=1)
+            self.assertTrue(isinstance(uploads, types.GeneratorType))
+            self.assertEqual(list(uploads), [])
+        finally:
+            i.close()
+
+    def test_with_token_shares_pool(self):
+        client = self.i.with_token('other')
+        self.assertTrue(isinstance(client, AsyncImgur))
+        self.assertTrue(client._pool is self.i._pool)
+        self.assertEqual(client.imgur.token, 'other')
+        self.assertEqual(client.request_json('/paged/0').get(timeout=5), range(0, 3))
+        client.close()  # Leaves the shared pool running
+        self.assertEqual(self.i.request_json('/paged/1').get(timeout=5), range(3, 6))
+
+
+class UploadImagesTest(unittest.TestCase):
+    class StubImgur(Imgur):
+        def upload_image_local(self, image_path, name=None, title=None, description=None, album=None):
+            if image_path == 'bad.jpg':
+                raise ImgurError('POST', image_path, 400, None, 'Bad image')
+            if image_path == 'down.jpg':
+                raise requests.ConnectionError('Connection refused')
+            return Image(self, json_dict={'id': image_path, 'album': album})
+
+        def upload_image_by_url(self, url, name=None, title=None, description=None, album=None):
+            return Image(self, json_dict={'id': url, 'album': album})
+
+    def setUp(self):
+        self.i = self.StubImgur('client_id', 'client_secret')
+        self.checkpoint = 'checkpoint-%s.jsonl' % uuid.uuid4()
+
+    def tearDown(self):
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def test_reports_each_item(self):
+        items = ['a.jpg', 'bad.jpg', 'http://example.com/c.png']
+        results = dict(self.i.upload_images(items, concurrency=2, album='alb'))
+        self.assertEqual(set(results), set(items))
+        self.assertTrue(isinstance(results['bad.jpg'], ImgurError))
+        self.assertEqual(results['a.jpg'].album, 'alb')
+        self.assertEqual(results['http://example.com/c.png'].id, 'http://example.com/c.png')
+
+    def test_reports_io_and_connection_errors(self):
+        path = 'upload-%s.jpg' % uuid.uuid4()
+        with open(path, 'wb') as f:
+            f.write('x')
+        try:
+            items = [path, 'missing-%s.jpg' % uuid.uuid4(), 'down.jpg']
+            with open('down.jpg', 'wb') as f:
+                f.write('x')
+            results = dict(self.i.upload_images(items, concurrency=2, max_inflight_bytes=10,
+                                                checkpoint=self.checkpoint))
+        finally:
+            os.remove(path)
+            os.remove('down.jpg')
+        self.assertEqual(results[path].id, path)
+        self.assertTrue(isinstance(results[items[1]], EnvironmentError))
+        self.assertTrue(isinstance(results['down.jpg'], requests.ConnectionError))
+        with open(self.checkpoint) as checkpoint_file:
+            self.assertEqual(len(checkpoint_file.readlines()), 1)
+
+    def test_resume_from_checkpoint(self):
+        list(self.i.upload_images(['a.jpg', 'bad.jpg'], checkpoint=self.checkpoint))
+        results = dict(self.i.upload_images(['a.jpg', 'bad.jpg', 'b.jpg'], checkpoint=self.checkpoint))
+        self.assertEqual(sorted(results), ['b.jpg', 'bad.jpg'])
+
+    def test_close_early_with_budget(self):
+        import threading
+        paths = ['budget-%s-%d.jpg' % (uuid.uuid4(), n) for n in range(6)]
+        for path, size in zip(paths, [1, 5, 5, 6, 6, 6]):
+            with open(path, 'wb') as f:
+                f.write('x' * size)
+        try:
+            uploads = self.i.upload_images(paths, concurrency=1, max_inflight_bytes=10)
+            next(uploads)
+            closer = threading.Thread(target=uploads.close)
+            closer.daemon = True
+            closer.start()
+            closer.join(5)
+            self.assertFalse(closer.is_alive())
+        finally:
+            for path in paths:
+                os.remove(path)
+
+    def test_byte_budget_closed(self):
+        budget = helpers._ByteBudget(10)
+        self.assertTrue(budget.acquire(8))
+        budget.close()
+        self.assertFalse(budget.acquire(5))
+        self.assertEqual(budget.in_flight, 8)
+
+    def test_byte_budget_lets_oversized_item_through(self):
+        budget = helpers._ByteBudget(10)
+        budget.acquire(100)
+        self.assertEqual(budget.in_flight, 100)
+        budget.release(100)
+        self.assertEqual(budget.in_flight, 0)
+
+
+class MultipartStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.path = 'multipart-%s.bin' % uuid.uuid4()
+        with open(self.path, 'wb') as f:
+            f.write(os.urandom(200 * 1024))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def parse(self, body, content_type):
+        import cgi
+        import StringIO
+        environ = {'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': content_type,
+                   'CONTENT_LENGTH': str(len(body))}
+        return cgi.FieldStorage(fp=StringIO.StringIO(body), environ=environ)
+
+    def test_stream_is_valid_multipart(self):
+        with open(self.path, 'rb') as f:
+            stream = helpers._MultipartStream({'title': u'T\xeftle', 'type': 'file'}, 'image', f)
+            length = len(stream)
+            body = ''.join(iter(lambda: stream.read(1000), ''))
+        self.assertEqual(length, len(body))
+        form = self.parse(body, stream.content_type)
+        self.assertEqual(form.getvalue('title'), u'T\xeftle'.encode('utf-8'))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(form['image'].value, f.read())
+        self.assertEqual(form['image'].filename, self.path)
+
+    def test_rewind(self):
+        with open(self.path, 'rb') as f:
+            stream = helpers._MultipartStream({}, 'image', f)
+            first = stream.read()
+            stream.seek(0)
+            self.assertEqual(len(stream), len(first))
+            self.assertEqual(stream.read(), first)
+
+
+class FakeSession(object):
+    """A stand-in for requests.Session that answers every request with
+    `body` and records the requests made."""
+    class Response(object):
+        def __init__(self, method, url, status_code, text, headers):
+            self.request = self
+            self.method = method.upper()
+            self.url = url
+            self.status_code = status_code
+            self.text = self.content = text
+            self.headers = headers
+            self.closed = False
+
+        def iter_content(self, chunk_size=1):
+            for i in range(0, len(self.content), chunk_size):
+                yield self.content[i:i + chunk_size]
+
+        def close(self):
+            self.closed = True
+
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.response_headers = headers or {}
+        self.headers = {}
+        self.cookies = {}
+        self.requests = []
+        self.responses = []
+        self.delay = 0
+
+    def request(self, method, url, params=None, data=None, headers=None, **kwargs):
+        self.requests.append((method.lower(), url, headers))
+        time.sleep(self.delay)
+        status_code = self.status_code
+        if isinstance(status_code, list):  # One status per request, the last one repeated
+            status_code = status_code.pop(0) if len(status_code) > 1 else status_code[0]
+        if isinstance(status_code, Exception):
+            raise status_code
+        response = self.Response(method, url, status_code, self.body, self.response_headers)
+        self.responses.append(response)
+        return response
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+class CountingImgur(Imgur):
+    """An Imgur that talks to a FakeSession."""
+    def __init__(self, body, **kwargs):
+        super(CountingImgur, self).__init__('client_id', 'client_secret', **kwargs)
+        self.http = FakeSession(body)
+        self.token = None
+        self.requests = self.http.requests
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.cache import ResponseCache
+        body = json.dumps({'data': {'id': 'abc', 'views': 3}, 'success': True, 'status': 200})
+        self.i = CountingImgur(body, cache=ResponseCache(ttls={'account_stats': 0}))
+
+    def test_repeated_get_is_cached(self):
+        self.assertEqual(self.i.get_image('abc').views, 3)
+        self.assertEqual(self.i.get_image('abc').views, 3)
+        self.assertEqual(len(self.i.requests), 1)
+
+    def test_params_are_part_of_key(self):
+        url = self.i.config['image'] % 'abc'
+        self.i.request_json(url, data={'a': 1})
+        self.i.request_json(url, data={'a': 2})
+        self.i.request_json(url, data={'a': 1, 'b': None})
+        self.assertEqual(len(self.i.requests), 2)
+
+    def test_unicode_params(self):
+        url = self.i.config['image'] % 'abc'
+        self.i.request_json(url, data={'q': u'caf\xe9'})
+        self.i.request_json(url, data={'q': u'caf\xe9'})
+        self.assertEqual(len(self.i.requests), 1)
+        self.i.cache = None
+        self.i.request_json(url, data={'q': u'caf\xe9'})
+        self.assertEqual(len(self.i.requests), 2)
+
+    def test_write_invalidates(self):
+        self.i.get_image('abc')
+        self.i.update_img_info('abc', title='new')
+        self.i.get_image('abc')
+        self.assertEqual([r[0] for r in self.i.requests], ['get', 'post', 'get'])
+
+    def test_write_through_deletehash_invalidates_image(self):
+        image = self.i.get_image('abc')
+        image.deletehash = 'hash'
+        image.update_img_info(title='new')
+        self.i.get_image('abc')
+        image.delete()
+        self.i.get_image('abc')
+        self.assertEqual([r[0] for r in self.i.requests], ['get', 'post', 'get', 'delete', 'get'])
+        self.assertTrue(self.i.requests[1][1].endswith('/image/hash'))
+
+    def test_zero_ttl_disables_endpoint(self):
+        self.i.get_account_stats()
+        self.i.get_account_stats()
+        self.assertEqual(len(self.i.requests), 2)
+
+    def test_stale_entry_is_revalidated(self):
+        self.i.http.response_headers = {'ETag': '"v1"', 'Last-Modified': 'Sat, 17 Oct 2026 10:00:00 GMT'}
+        self.i.get_image('abc')
+        entry = self.i.cache.backend.get(self.i.config['image'] % 'abc', '')
+        entry.stored_at -= 3600
+        self.i.http.status_code, self.i.http.body = 304, ''
+        self.assertEqual(self.i.get_image('abc').views, 3)
+        headers = self.i.requests[-1][2]
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertEqual(headers['If-Modified-Since'], 'Sat, 17 Oct 2026 10:00:00 GMT')
+        # The 304 made the entry fresh again
+        self.i.get_image('abc')
+        self.assertEqual(len(self.i.requests), 2)
+
+    def test_not_modified_without_cached_entry(self):
+        self.i.http.status_code = [304, 200]
+        url = self.i.config['image'] % 'abc'
+        self.assertEqual(self.i.request_json(url, headers={'If-None-Match': '"v1"'})['data']['id'], 'abc')
+        self.assertEqual(self.i.requests[0][2]['If-None-Match'], '"v1"')
+        self.assertFalse('If-None-Match' in self.i.requests[1][2])
+        self.i.http.status_code = [304]
+        self.i.cache = None
+        self.assertRaises(ImgurError, self.i.request_json, url, headers={'If-None-Match': '"v1"'})
+
+    def test_lru_eviction(self):
+        from pyimgur.cache import CacheEntry, MemoryCache
+        backend = MemoryCache(max_entries=2)
+        for url in ('a', 'b', 'c'):
+            backend.set(url, '', CacheEntry(url))
+        self.assertEqual(backend.get('a', ''), None)
+        self.assertEqual(backend.get('c', '').text, 'c')
+
+    def test_memory_cache_delete(self):
+        from pyimgur.cache import CacheEntry, MemoryCache
+        backend = MemoryCache(max_entries=3)
+        for url, variant in [('a', ''), ('a', 'x=1'), ('b', ''), ('a', 'x=2')]:
+            backend.set(url, variant, CacheEntry(url + variant))
+        backend.delete('a')
+        self.assertEqual([backend.get('a', variant) for variant in ('', 'x=1', 'x=2')], [None] * 3)
+        self.assertEqual(backend.get('b', '').text, 'b')
+        self.assertEqual(backend._variants, {'b': set([''])})
+
+    def test_disk_cache(self):
+        import shutil
+        import tempfile
+        from pyimgur.cache import CacheEntry, DiskCache
+        directory = tempfile.mkdtemp()
+        try:
+            DiskCache(directory).set('url', 'a=1', CacheEntry('text'))
+            backend = DiskCache(directory)
+            self.assertEqual(backend.get('url', 'a=1').text, 'text')
+            backend.delete('url')
+            self.assertEqual(backend.get('url', 'a=1'), None)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_endpoint_for(self):
+        config = Config()
+        self.assertEqual(config.endpoint_for(config['image'] % 'abc'), 'image')
+        self.assertEqual(config.endpoint_for(config['account_submissions'] % 'me' + '/2'),
+                         'account_submissions')
+        self.assertEqual(config.endpoint_for('https://example.com/'), None)
+
+
+class ObjectTypesTest(unittest.TestCase):
+    def setUp(self):
+        self.i = Imgur('client_id', 'client_secret')
+
+    def test_single_object(self):
+        image = self.i._to_objects('Image', {'data': {'id': 'abc'}, 'success': True})
+        self.assertTrue(isinstance(image, Image))
+        self.assertEqual(image.id, 'abc')
+
+    def test_list_of_objects(self):
+        favs = self.i._to_objects('Favable', {'data': [{'id': 'a', 'is_album': True},
+                                                       {'id': 'b', 'is_album': False}]})
+        self.assertEqual([type(f) for f in favs], [Album, Image])
+
+    def test_nested_data_is_left_alone(self):
+        image = self.i._to_objects('Image', {'data': {'id': 'abc', 'extra': {'data': 1}}})
+        self.assertEqual(image.extra, {'data': 1})
+
+    def test_no_envelope(self):
+        self.assertEqual(self.i._to_objects('Image', [1, 2]), [1, 2])
+
+
+class SlotsTest(unittest.TestCase):
+    def setUp(self):
+        self.i = Imgur('client_id', 'client_secret')
+
+    def test_known_fields_use_slots(self):
+        image = Image(self.i, json_dict={'id': 'abc', 'views': 3})
+        self.assertFalse(hasattr(image, '__dict__'))
+        self.assertFalse(hasattr(image, '_extra'))
+        self.assertEqual((image.id, image.views), ('abc', 3))
+
+    def test_unknown_fields(self):
+        image = Image(self.i, json_dict={'id': 'abc', 'brand_new_field': 1})
+        self.assertEqual(image.brand_new_field, 1)
+        image.other = 2
+        self.assertEqual(image.other, 2)
+        del image.other
+        self.assertFalse(hasattr(image, 'other'))
+        self.assertRaises(AttributeError, getattr, image, 'missing')
+
+    def test_field_named_like_method(self):
+        comment = Comment(self.i, json_dict={'id': 1, 'vote': 'up'})
+        self.assertEqual(comment.vote, 'up')
+        self.assertFalse(hasattr(comment, '_extra'))
+
+    def test_underscore_names(self):
+        image = Image(self.i, json_dict={'id': 'abc', 'owned': True}, underscore_names=['owned', 'id'])
+        self.assertEqual(image._owned, True)
+        self.assertEqual(image._id, 'abc')
+        self.assertFalse(hasattr(image, 'id'))
+
+    def test_pickle(self):
+        import pickle
+        self.i.set_access_credentials('token', 'refresh', expires_in=3600)
+        image = Image(self.i, json_dict={'id': 'abc', 'views': 3, 'brand_new_field': 1})
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(image, protocol))
+            self.assertEqual((copy.id, copy.views, copy.brand_new_field), ('abc', 3, 1))
+            self.assertRaises(AttributeError, getattr, copy, 'title')
+            self.assertEqual(copy.imgur_session.token, 'token')
+            self.assertEqual(copy.imgur_session.refresh_token, 'refresh')
+
+
+class LazyObjectTest(unittest.TestCase):
+    def setUp(self):
+        body = json.dumps({'data': {'id': 'me', 'bio': 'Hello', 'reputation': 7}, 'success': True})
+        self.i = CountingImgur(body, lazy_objects=True)
+
+    def test_fields_copied_on_first_read(self):
+        image = self.i._to_objects('Image', {'data': {'id': 'abc', 'views': 3}})
+        self.assertRaises(AttributeError, object.__getattribute__, image, 'views')
+        self.assertEqual(image.views, 3)
+        self.assertEqual(object.__getattribute__(image, 'views'), 3)
+        self.assertRaises(AttributeError, getattr, image, 'missing')
+
+    def test_fetch_deferred_until_unknown_attribute(self):
+        account = Account(self.i, url=self.i.config['account'] % 'me', lazy=True)
+        self.assertEqual(self.i.requests, [])
+        self.assertEqual(account.bio, 'Hello')
+        self.assertEqual(account.reputation, 7)
+        self.assertEqual(len(self.i.requests), 1)
+
+    def test_concurrent_reads_wait_for_fetch(self):
+        from multiprocessing.pool import ThreadPool
+        self.i.http.delay = 0.1
+        account = Account(self.i, url=self.i.config['account'] % 'me', lazy=True)
+        pool = ThreadPool(5)
+        try:
+            bios = pool.map(lambda n: account.bio, range(5))
+        finally:
+            pool.close()
+        self.assertEqual(bios, ['Hello'] * 5)
+        self.assertEqual(len(self.i.requests), 1)
+
+    def test_no_fetch_without_fetch(self):
+        account = Account(self.i, url='unused', fetch=False, lazy=True)
+        self.assertRaises(AttributeError, getattr, account, 'bio')
+        self.assertEqual(self.i.requests, [])
+
+    def test_underscore_names(self):
+        image = Image(self.i, json_dict={'id': 'abc', 'owned': True}, underscore_names=['owned'], lazy=True)
+        self.assertEqual(image._owned, True)
+        self.assertRaises(AttributeError, getattr, image, 'owned')
+
+
+class RawContentTest(unittest.TestCase):
+    def setUp(self):
+        self.items = [{'id': 'a', 'link': 'http://i.imgur.com/a.jpg', 'views': 1, 'is_album': False},
+                      {'id': 'b', 'link': 'http://imgur.com/a/b', 'views': 2, 'is_album': True}]
+        body = json.dumps({'data': self.items, 'success': True, 'status': 200})
+        self.i = CountingImgur(body)
+
+    def test_raw(self):
+        self.assertEqual(list(self.i.get_account_submissions(raw=True)), self.items)
+
+    def test_fields(self):
+        self.assertEqual(list(self.i.get_account_submissions(fields=['id', 'link'])),
+                         [{'id': 'a', 'link': 'http://i.imgur.com/a.jpg'},
+                          {'id': 'b', 'link': 'http://imgur.com/a/b'}])
+
+    def test_stream(self):
+        self.i.STREAM_CHUNK_SIZE = 7
+        self.assertEqual(list(self.i.get_account_submissions(stream=True, fields=['id'])),
+                         [{'id': 'a'}, {'id': 'b'}])
+
+    def test_stream_parser_chunk_boundaries(self):
+        doc = {'xdata': 'data', 'data': [{'id': 'a\\"b[,]{', 'n': [1, {'x': 'y'}]}, 2, 's\\\\', [], {}],
+               'status': 200}
+        text = json.dumps(doc)
+        for size in range(1, 12):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(list(helpers._iter_json_items(chunks, 'data')), doc['data'])
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.ratelimit import RateLimiter
+        self.now = 1000.0
+        self.slept = []
+        self.limiter = RateLimiter(clock=lambda: self.now, sleep=self.slept.append)
+
+    def test_burst_below_remaining_does_not_sleep(self):
+        self.limiter.update('cid', None, {'X-RateLimit-UserLimit': '2000', 'X-RateLimit-UserRemaining': '2000',
+                                          'X-RateLimit-UserReset': '4600'})
+        for _ in range(50):
+            self.limiter.acquire('cid')
+        self.assertEqual(self.slept, [])
+        self.assertEqual(self.limiter.remaining('cid')['user']['remaining'], 1950)
+
+    def test_waits_for_reset_once_empty(self):
+        self.limiter.reserve = 1
+        self.limiter.update('cid', None, {'X-RateLimit-UserLimit': '100', 'X-RateLimit-UserRemaining': '3',
+                                          'X-RateLimit-UserReset': '1100'})
+        for _ in range(4):
+            self.limiter.acquire('cid')
+        self.assertEqual(self.slept, [100.0, 100.0])
+        self.now = 1100.0
+        self.limiter.acquire('cid')
+        self.assertEqual(self.limiter.remaining('cid')['user']['remaining'], 97)
+
+    def test_waits_for_reset_when_exhausted(self):
+        self.limiter.update_from_credits('cid', 'token', {'UserLimit': 100, 'UserRemaining': 0, 'UserReset': 1500,
+                                                          'ClientLimit': 1000, 'ClientRemaining': 900})
+        self.limiter.acquire('cid', 'token')
+        self.assertEqual(self.slept, [500])
+        self.assertEqual(self.limiter.remaining('cid', 'token')['client']['remaining'], 899)
+
+    def test_post_limit_only_for_posts(self):
+        self.limiter.update('cid', None, {'X-Post-Rate-Limit-Limit': '50', 'X-Post-Rate-Limit-Remaining': '0',
+                                          'X-Post-Rate-Limit-Reset': '60'})
+        self.limiter.acquire('cid', method='GET')
+        self.assertEqual(self.slept, [])
+        self.limiter.acquire('cid', method='POST')
+        self.assertEqual(self.slept, [60])
+
+    def test_client_reads_headers(self):
+        i = CountingImgur(json.dumps({'data': {}}), rate_limiter=self.limiter)
+        i.http.response_headers = {'X-RateLimit-ClientLimit': '12500', 'X-RateLimit-ClientRemaining': '12000'}
+        i.get_image('abc')
+        self.assertEqual(self.limiter.remaining('client_id')['client'],
+                         {'limit': 12500, 'remaining': 12000, 'reset': None})
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.retry import RetryPolicy
+        self.slept = []
+        self.policy = RetryPolicy(max_retries=2, backoff=1, sleep=self.slept.append)
+        body = json.dumps({'data': {'id': 'abc'}, 'success': True, 'status': 200})
+        self.i = CountingImgur(body, retry_policy=self.policy)
+
+    def test_get_retried(self):
+        self.i.http.status_code = [503, 500, 200]
+        self.assertEqual(self.i.get_image('abc').id, 'abc')
+        self.assertEqual(len(self.i.requests), 3)
+        self.assertTrue(0 <= self.slept[0] <= 1 and 0 <= self.slept[1] <= 2)
+
+    def test_gives_up(self):
+        self.i.http.status_code = [503]
+        self.assertRaises(ImgurError, self.i.get_image, 'abc')
+        self.assertEqual(len(self.i.requests), 3)
+
+    def test_retried_response_closed(self):
+        self.i.http.status_code = [503, 200]
+        response = self.i._request(self.i.config['image'] % 'abc', stream=True)
+        self.assertEqual([r.closed for r in self.i.http.responses], [True, False])
+        self.assertTrue(response is self.i.http.responses[-1])
+
+    def test_connection_error_retried(self):
+        self.i.http.status_code = [requests.ConnectionError(), 200]
+        self.assertEqual(self.i.get_image('abc').id, 'abc')
+
+    def test_post_only_retried_when_idempotent(self):
+        self.i.http.status_code = [503, 200]
+        self.assertRaises(ImgurError, self.i.upload_image_by_url, 'http://example.com/a.png')
+        self.i.http.status_code = [503, 200]
+        self.assertEqual(self.i.upload_image_by_url('http://example.com/a.png', idempotent=True).id, 'abc')
+
+    def test_retry_after(self):
+        self.i.http.status_code = [429, 200]
+        self.i.http.response_headers = {'Retry-After': '7'}
+        self.i.get_image('abc')
+        self.assertEqual(self.slept, [7])
+
+    def test_deadline(self):
+        self.policy.deadline = 5
+        self.i.http.status_code = [429, 200]
+        self.i.http.response_headers = {'Retry-After': '7'}
+        self.assertRaises(ImgurError, self.i.get_image, 'abc')
+        self.assertEqual(self.slept, [])
+
+    def test_walk_resumes_at_failed_page(self):
+        self.i.http.body = json.dumps({'data': [{'id': 'a', 'is_album': False}]})
+        self.i.http.status_code = [200, 502, 200]
+        things = self.i.get_account_submissions(limit=2)
+        self.assertEqual([t.id for t in things], ['a', 'a'])
+        self.assertEqual([url[-1] for method, url, headers in self.i.requests], ['0', '1', '1'])
+
+
+class SharedSessionTest(unittest.TestCase):
+    def test_clients_share_session(self):
+        session = FakeSession(json.dumps({'data': {'id': 'abc'}}))
+        alice = Imgur('client_id', 'client_secret', token='alice', session=session)
+        bob = Imgur('client_id', 'client_secret', token='bob', session=session)
+        anonymous = Imgur('client_id', 'client_secret', session=session)
+        for client in (alice, bob, anonymous):
+            client.get_image('abc')
+        self.assertEqual([headers['Authorization'] for method, url, headers in session.requests],
+                         ['Bearer alice', 'Bearer bob', 'Client-ID client_id'])
+        self.assertEqual(session.headers, {})
+
+    def test_pool_size(self):
+        adapter = helpers.create_session(pool_maxsize=32).get_adapter('https://api.imgur.com/3')
+        self.assertEqual(adapter._pool_maxsize, 32)
+
+    def test_module_functions_share_session(self):
+        self.assertTrue(helpers._get_shared_session() is helpers._get_shared_session())
+
+    def test_fav_img_uses_client_session(self):
+        session = FakeSession(json.dumps({'data': 'favorited', 'success': True}))
+        self.assertRaises(AccessDeniedError, Imgur('client_id', 'client_secret', session=session).fav_img, 'abc')
+        alice = Imgur('client_id', 'client_secret', token='alice', session=session)
+        self.assertEqual(alice.fav_img('abc')['data'], 'favorited')
+        self.assertEqual([(method, url, headers['Authorization']) for method, url, headers in session.requests],
+                         [('post', alice.config['fav_image'] % 'abc', 'Bearer alice')])
+
+    def test_test_response(self):
+        helpers._test_response('GET', 'url', 200, '{"data": {}}')
+        self.assertRaises(ImgurError, helpers._test_response, 'GET', 'url', 200, '')
+        try:
+            helpers._test_response('GET', 'url', 404, '{"data": {"error": "Not found"}}')
+        except ImgurError as e:
+            self.assertEqual((e.http_code, e.error['data']['error']), (404, 'Not found'))
+        self.assertRaises(ImgurError, helpers._test_response, 'GET', 'url', 500, '<html>')
+
+
+class WithTokenTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.cache import ResponseCache
+        from pyimgur.ratelimit import RateLimiter
+        self.limiter = RateLimiter()
+        self.i = CountingImgur(json.dumps({'data': {'id': 'abc'}}), cache=ResponseCache(), rate_limiter=self.limiter)
+        self.i.http.response_headers = {'X-RateLimit-UserLimit': '100', 'X-RateLimit-UserRemaining': '90'}
+
+    def test_shares_transport_not_credentials(self):
+        alice, bob = self.i.with_token('alice'), self.i.with_token('bob')
+        self.assertTrue(alice.http is self.i.http and alice.cache is self.i.cache)
+        alice.get_image('abc')
+        bob.get_image('abc')
+        self.assertEqual([headers['Authorization'] for method, url, headers in self.i.requests],
+                         ['Bearer alice', 'Bearer bob'])
+        self.assertEqual(self.i.token, None)
+
+    def test_cache_per_token(self):
+        alice = self.i.with_token('alice')
+        alice.get_image('abc')
+        alice.get_image('abc')
+        self.i.with_token('bob').get_image('abc')
+        self.assertEqual(len(self.i.requests), 2)
+
+    def test_credits_per_token(self):
+        self.i.with_token('alice').get_image('abc')
+        self.assertEqual(self.limiter.remaining('client_id', 'alice')['user']['remaining'], 90)
+        self.assertEqual(self.limiter.remaining('client_id', 'bob')['user']['remaining'], None)
+
+    def test_threads(self):
+        from multiprocessing.pool import ThreadPool
+        tokens = ['user%d' % n for n in range(20)]
+        pool = ThreadPool(8)
+        try:
+            pool.map(lambda token: self.i.with_token(token).get_image('abc'), tokens)
+        finally:
+            pool.close()
+        self.assertEqual(sorted(headers['Authorization'] for method, url, headers in self.i.requests),
+                         sorted('Bearer ' + token for token in tokens))
+
+
+class TokenRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.i = CountingImgur(json.dumps({'data': {'id': 'abc'}}))
+        self.refreshes = []
+
+        def refresh_access_information(refresh_token):
+            self.refreshes.append(refresh_token)
+            time.sleep(0.05)
+            return {'access_token': 'new%d' % len(self.refreshes), 'refresh_token': 'refresh',
+                    'expires_in': 3600, 'token_type': 'bearer', 'scope': None,
+                    'account_username': 'me', 'account_id': 1}
+        self.i.refresh_access_information = refresh_access_information
+
+    def tearDown(self):
+        self.i.stop_auto_refresh()
+
+    def test_refreshed_before_request(self):
+        self.i.set_access_credentials('old', 'refresh', expires_in=60)
+        self.i.get_image('abc')
+        self.assertEqual(self.refreshes, ['refresh'])
+        self.assertEqual(self.i.requests[-1][2]['Authorization'], 'Bearer new1')
+        self.assertEqual(self.i.username, 'me')
+
+    def test_concurrent_refreshes_coalesced(self):
+        from multiprocessing.pool import ThreadPool
+        self.i.set_access_credentials('old', 'refresh', expires_in=60)
+        pool = ThreadPool(10)
+        try:
+            pool.map(lambda n: self.i.get_image('abc'), range(10))
+        finally:
+            pool.close()
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertEqual(set(headers['Authorization'] for method, url, headers in self.i.requests),
+                         set(['Bearer new1']))
+
+    def test_refresh_finished_after_expiry_check(self):
+        self.i.set_access_credentials('old', 'refresh', expires_in=60)
+        token_expiring = self.i._token_expiring
+
+        def refreshed_meanwhile():
+            expiring = token_expiring()
+            if expiring:
+                self.i.refresh_access_token()  # By another thread
+            return expiring
+        self.i._token_expiring = refreshed_meanwhile
+        self.i.get_image('abc')
+        self.assertEqual(self.refreshes, ['refresh'])
+        self.assertEqual(self.i.requests[-1][2]['Authorization'], 'Bearer new1')
+
+    def test_background_refresh(self):
+        self.i.REFRESH_MARGIN = 0
+        self.i.start_auto_refresh()
+        self.i.set_access_credentials('old', 'refresh', expires_in=0.01)
+        for _ in range(100):
+            if self.i.token == 'new1':
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.i.token, 'new1')
+        self.assertEqual(self.i.requests, [])
+
+    def test_no_refresh_without_expiry(self):
+        self.i.set_access_credentials('old', 'refresh')
+        self.i.get_image('abc')
+        self.assertEqual(self.refreshes, [])
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.i = CountingImgur(json.dumps({'data': {'id': 'abc'}}))
+        self.i.http.delay = 0.1
+
+    def fetch_all(self, function, n=10):
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(n)
+        try:
+            return pool.map(lambda _: function(), range(n))
+        finally:
+            pool.close()
+
+    def test_concurrent_gets_share_request(self):
+        images = self.fetch_all(lambda: self.i.get_image('abc'))
+        self.assertEqual(len(self.i.requests), 1)
+        self.assertEqual([image.id for image in images], ['abc'] * 10)
+
+    def test_errors_shared(self):
+        self.i.http.status_code = 404
+        self.fetch_all(lambda: self.assertRaises(ImgurError, self.i.get_image, 'abc'))
+        self.assertEqual(len(self.i.requests), 1)
+
+    def test_different_tokens_not_shared(self):
+        self.fetch_all(lambda: self.i.with_token(str(uuid.uuid4())).get_image('abc'), n=3)
+        self.assertEqual(len(self.i.requests), 3)
+
+
+class BatchFetchTest(unittest.TestCase):
+    class MissingSession(FakeSession):
+        """Answer 404 for urls containing 'missing'."""
+        def request(self, method, url, **kwargs):
+            response = super(BatchFetchTest.MissingSession, self).request(method, url, **kwargs)
+            if 'missing' in url:
+                response.status_code = 404
+            return response
+
+    def setUp(self):
+        from pyimgur.cache import ResponseCache
+        self.i = CountingImgur(json.dumps({'data': {'id': 'abc', 'title': 'A'}}),
+                               cache=ResponseCache())
+        self.i.http = self.MissingSession(self.i.http.body)
+        self.i.requests = self.i.http.requests
+
+    def test_ordered(self):
+        ids = ['a', 'missing', 'b', 'c']
+        images = self.i.get_images(ids, concurrency=2)
+        self.assertEqual(list(images), ids)
+        self.assertEqual(images['a'].title, 'A')
+        self.assertTrue(isinstance(images['missing'], ImgurError))
+        self.assertEqual(images['missing'].http_code, 404)
+
+    def test_stream(self):
+        results = dict(self.i.get_albums(['a', 'missing'], stream=True))
+        self.assertEqual(set(results), set(['a', 'missing']))
+        self.assertTrue(isinstance(results['missing'], ImgurError))
+        self.assertTrue(any(url.endswith('/album/a') for _, url, _ in self.i.requests))
+
+    def test_shares_cache(self):
+        self.i.get_image('a')
+        self.i.get_images(['a', 'b'])
+        self.assertEqual(len(self.i.requests), 2)
+
+
+class DecoderTest(unittest.TestCase):
+    def test_default_falls_back_to_stdlib(self):
+        from pyimgur.decoders import get_decoder
+        self.assertEqual(get_decoder('json'), json.loads)
+        self.assertTrue(callable(get_decoder()))
+        self.assertRaises(ImportError, get_decoder, 'no_such_json_library')
+
+    def test_decodes_response_bytes(self):
+        decoded = []
+        def decoder(content):
+            decoded.append(content)
+            return json.loads(content)
+        body = json.dumps({'data': {'id': 'abc', 'title': 'A'}})
+        i = CountingImgur(body, json_decoder=decoder)
+        self.assertEqual(i.get_image('abc').title, 'A')
+        self.assertEqual(decoded, [body])
+
+    def test_decoder_by_name(self):
+        i = CountingImgur(json.dumps({'data': [{'id': 'a'}, {'id': 'b'}]}), json_decoder='json')
+        self.assertEqual(i.json_decoder, json.loads)
+        items = i.get_content(i.config['image'] % 'x', paginated=False, stream=True)
+        self.assertEqual([item['id'] for item in items], ['a', 'b'])
+
+
+class FakeServerTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.fakeserver import FakeImgurServer
+        self.server = FakeImgurServer(albums=7, images_per_album=2, page_size=3).start()
+        self.i = self.server.client()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_pagination(self):
+        albums = list(self.i.get_account_albums(limit=None))
+        self.assertEqual([album.id for album in albums], list(reversed(self.server.albums)))
+        self.assertEqual(len(list(self.i.get_account_albums(limit=None, prefetch=2))), 7)
+
+    def test_upload(self):
+        image = self.i.upload_image_by_url('http://example.com/a.png', title='Title', album='alb00001')
+        self.assertEqual(self.i.get_image(image.id).title, 'Title')
+        self.assertEqual(len(self.server.albums['alb00001']['images']), 3)
+
+    def test_errors(self):
+        from pyimgur.retry import RetryPolicy
+        self.assertRaises(ImgurError, self.i.get_image, 'missing')
+        self.server.fail_every = 2
+        self.assertRaises(ImgurError, self.i.get_image, 'img00001')
+        self.i.retry_policy = RetryPolicy(sleep=lambda seconds: None)
+        self.assertEqual(self.i.get_image('img00002').id, 'img00002')
+
+    def test_rate_limit(self):
+        from pyimgur.ratelimit import RateLimiter
+        self.i.rate_limiter = RateLimiter()
+        self.i.get_image('img00001')
+        self.assertEqual(self.i.rate_limiter.remaining('client_id')['user']['remaining'], 1999)
+        self.server.user_limit = 0
+        self.server._user_remaining.clear()
+        try:
+            self.i.get_image('img00001')
+        except ImgurError as e:
+            self.assertEqual(e.http_code, 429)
+        else:
+            self.fail('Not rate limited')
+
+
+class MetricsTest(unittest.TestCase):
+    class Recorder(object):
+        def __init__(self):
+            self.events = []
+
+        def record(self, event):
+            self.events.append(event)
+
+    def setUp(self):
+        from pyimgur.cache import ResponseCache
+        self.recorder = self.Recorder()
+        self.i = CountingImgur(json.dumps({'data': {'id': 'abc'}}), cache=ResponseCache(),
+                               metrics=self.recorder)
+
+    def test_requests_and_cache_hits(self):
+        self.i.get_image('abc')
+        self.i.get_image('abc')
+        self.assertEqual(len(self.recorder.events), 2)
+        sent, cached = self.recorder.events
+        self.assertEqual((sent.endpoint, sent.method, sent.status, sent.cache_hit), ('image', 'GET', 200, False))
+        self.assertEqual(sent.bytes_received, len(self.i.http.body))
+        self.assertTrue(cached.cache_hit)
+
+    def test_retries_and_errors(self):
+        from pyimgur.retry import RetryPolicy
+        self.i.retry_policy = RetryPolicy(max_retries=1, sleep=lambda seconds: None)
+        self.i.http.status_code = 503
+        self.assertRaises(ImgurError, self.i.get_image, 'abc')
+        self.assertEqual((self.recorder.events[0].status, self.recorder.events[0].retries), (503, 1))
+        self.i.http.status_code = requests.ConnectionError()
+        self.assertRaises(requests.ConnectionError, self.i.get_image, 'def')
+        self.assertTrue(isinstance(self.recorder.events[1].error, requests.ConnectionError))
+
+    def test_prometheus(self):
+        from pyimgur.metrics import PrometheusExporter
+        exporter = PrometheusExporter()
+        self.i.metrics = [exporter]
+        self.i.get_image('abc')
+        self.i.get_image('abc')
+        text = exporter.render()
+        self.assertTrue('pyimgur_requests_total{endpoint="image",method="GET",status="200"} 1.0' in text)
+        self.assertTrue('pyimgur_cache_hits_total{endpoint="image"} 1.0' in text)
+        self.assertTrue('pyimgur_request_duration_seconds_count{endpoint="image",method="GET"} 1' in text)
+
+    def test_statsd(self):
+        import socket
+        from pyimgur.metrics import StatsdExporter
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        exporter = StatsdExporter('127.0.0.1', server.getsockname()[1])
+        self.i.metrics = [exporter]
+        self.i.get_image('abc')
+        lines = server.recv(4096).decode('utf-8').split('\n')
+        exporter.close()
+        server.close()
+        self.assertTrue('pyimgur.image.requests:1|c' in lines)
+        self.assertTrue('pyimgur.image.status.200:1|c' in lines)
+
+    def test_failing_hook_ignored(self):
+        self.i.metrics = [None]
+        self.assertEqual(self.i.get_image('abc').id, 'abc')
+
+    def test_log(self):
+        from StringIO import StringIO
+        self.i._logger = StringIO()
+        self.i.get_image('abc')
+        self.assertTrue("'GET'" in self.i._logger.getvalue())
+
+
+class ThreadSafetyTest(unittest.TestCase):
+    def test_caller_data_unchanged(self):
+        i = CountingImgur(json.dumps({'data': [{'id': 'abc'}]}))
+        data = {'title': None, 'description': 'D'}
+        i.request_json(i.config['image'] % 'abc', 'POST', data=data)
+        self.assertEqual(data, {'title': None, 'description': 'D'})
+        params = {'q': 'cats'}
+        list(i.get_content(i.config['account_albums'] % 'me', params=params, limit=1))
+        self.assertEqual(params, {'q': 'cats'})
+
+    def test_stress(self):
+        from multiprocessing.pool import ThreadPool
+        from pyimgur.cache import ResponseCache
+        from pyimgur.fakeserver import FakeImgurServer
+        from pyimgur.ratelimit import RateLimiter
+        with FakeImgurServer(albums=20, images_per_album=5, page_size=7) as server:
+            i = server.client(cache=ResponseCache(), rate_limiter=RateLimiter(), pool_maxsize=32)
+            image_ids = list(server.images)
+
+            def work(n):
+                if n % 4 == 0:
+                    return len(list(i.get_account_albums(limit=None))) == 20
+                if n % 4 == 1:
+                    return len(list(i.get_account_albums(limit=None, prefetch=2, raw=True))) == 20
+                if n % 4 == 2:
+                    client = i.with_token('token%d' % (n % 3))
+                    return client.get_image(image_ids[n % 100]).id == image_ids[n % 100]
+                images = i.get_images(image_ids[n % 90:n % 90 + 10], concurrency=2)
+                return list(images) == [image.id for image in images.values()]
+
+            pool = ThreadPool(32)
+            try:
+                self.assertTrue(all(pool.map(work, range(400))))
+            finally:
+                pool.terminate()
+
+
+class CursorTest(unittest.TestCase):
+    def setUp(self):
+        self.i = PagedImgur([range(0, 3), range(3, 6), range(6, 9), range(9, 11)])
+
+    def test_resume(self):
+        from pyimgur.cursor import Cursor
+        cursor = Cursor()
+        walk = self.i.get_content('/paged', limit=None, cursor=cursor)
+        self.assertEqual([next(walk) for _ in range(4)], range(4))
+        walk.close()  # The worker crashed
+        self.assertEqual((cursor.page, cursor.offset, cursor.seen, cursor.done), (1, 1, 4, False))
+        cursor = Cursor.loads(cursor.dumps())
+        self.assertEqual(list(self.i.get_content('/paged', limit=None, cursor=cursor)), range(4, 11))
+        self.assertTrue(cursor.done)
+        self.assertEqual(list(self.i.get_content('/paged', limit=None, cursor=cursor)), [])
+
+    def test_resume_with_prefetch(self):
+        from pyimgur.cursor import Cursor
+        cursor = Cursor(page=1, offset=2, seen=5)
+        self.assertEqual(list(self.i.get_content('/paged', limit=None, prefetch=2, cursor=cursor)),
+                         range(5, 11))
+        self.assertEqual(cursor.seen, 11)
+
+    def test_limit_counts_seen(self):
+        from pyimgur.cursor import Cursor
+        cursor = Cursor(page=1, seen=3)
+        self.assertEqual(list(self.i.get_content('/paged', limit=6, cursor=cursor)), range(3, 6))
+        self.assertEqual(list(self.i.get_content('/paged', limit=6, cursor=cursor)), [])
+
+    def test_save_and_load(self):
+        from pyimgur.cursor import Cursor
+        path = os.path.join(os.path.dirname(__file__), 'cursor-%s.json' % uuid.uuid4())
+        try:
+            Cursor(page=3, offset=1, seen=10, step=2, end_page=9).save(path)
+            self.assertEqual(Cursor.load(path).to_dict(), {'page': 3, 'offset': 1, 'seen': 10, 'step': 2,
+                                                           'end_page': 9, 'done': False})
+        finally:
+            os.remove(path)
+
+    def test_split_without_end(self):
+        from pyimgur.cursor import Cursor
+        shards = Cursor(offset=1).split(3)
+        walks = [list(self.i.get_content('/paged', limit=None, cursor=shard)) for shard in shards]
+        self.assertEqual(walks, [[1, 2, 9, 10], [3, 4, 5], [6, 7, 8]])
+        self.assertTrue(all(shard.done for shard in shards))
+
+    def test_split_range(self):
+        from pyimgur.cursor import Cursor
+        shards = Cursor(end_page=4).split(3)
+        self.assertEqual([(shard.page, shard.end_page) for shard in shards], [(0, 2), (2, 4), (4, 4)])
+        walks = [list(self.i.get_content('/paged', limit=None, cursor=shard)) for shard in shards]
+        self.assertEqual(sum(walks, []), range(11))
+        self.assertEqual(self.i.requested.count('/paged/4'), 0)
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.fakeserver import FakeImgurServer
+        self.server = FakeImgurServer(albums=23, images_per_album=3, page_size=4).start()
+        self.i = self.server.client()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def export(self, **kwargs):
+        from StringIO import StringIO
+        from pyimgur.export import AccountExporter
+        output = StringIO()
+        counts = AccountExporter(self.i, **kwargs).export(output)
+        return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_export(self):
+        counts, records = self.export(max_pending=2)
+        self.assertEqual(counts, {'profile': 1, 'stats': 1, 'gallery_profile': 1, 'favorites': 4,
+                                  'gallery_favorites': 4, 'submissions': 69, 'albums': 23})
+        albums = [record['item']['id'] for record in records if record['section'] == 'albums']
+        self.assertEqual(sorted(albums), list(self.server.albums))
+
+    def test_failed_section(self):
+        self.server.fail_every = 1
+        counts, records = self.export(sections=['stats'])
+        self.assertEqual(counts, {'stats': 0})
+        self.assertEqual(records[0]['error']['status'], 503)
+
+    def test_shards(self):
+        exports = [self.export(sections=['albums', 'profile'], shard=(i, 3))[0] for i in range(3)]
+        self.assertEqual(sum(counts['albums'] for counts in exports), 23)
+        self.assertEqual([counts['profile'] for counts in exports], [1, 0, 0])
+
+    def test_unknown_section(self):
+        from pyimgur.export import AccountExporter
+        self.assertRaises(LookupError, AccountExporter, self.i, sections=['nope'])
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.fakeserver import FakeImgurServer
+        from pyimgur.sync import Syncer, SyncState
+        self.server = FakeImgurServer(albums=30, images_per_album=1, page_size=5).start()
+        self.i = self.server.client()
+        self.syncer = Syncer(self.i, SyncState())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def sync(self, section='submissions', full=False):
+        self.server.request_count = 0
+        return [(record.kind, record.id) for record in self.syncer.sync(section, full)]
+
+    def test_first_sync_is_full(self):
+        records = self.sync('albums')
+        self.assertEqual(sorted(records), [('added', id) for id in self.server.albums])
+        self.assertEqual(self.syncer.state.sections['albums']['high_water'], 1400000029)
+
+    def test_incremental(self):
+        self.sync()
+        self.assertEqual(self.sync(), [])
+        self.assertEqual(self.server.request_count, 1)  # Stopped on the first page
+        image = self.i.upload_image_by_url('http://example.com/a.png')
+        self.server.images['img00029']['views'] = 100
+        self.assertEqual(self.sync(), [('added', image.id), ('changed', 'img00029')])
+
+    def test_full_finds_removed(self):
+        self.sync()
+        del self.server.images['img00003']
+        self.server.images['img00004']['views'] = 100
+        self.assertEqual(self.sync(), [])
+        self.assertEqual(self.sync(full=True), [('changed', 'img00004'), ('removed', 'img00003')])
+        self.assertEqual(self.server.request_count, 7)
+
+    def test_interrupted_sync_resumes(self):
+        from pyimgur.sync import SyncState
+        records = self.syncer.sync('submissions')
+        next(records)
+        records.close()
+        self.assertEqual(self.syncer.state.sections['submissions']['high_water'], None)
+        path = os.path.join(os.path.dirname(__file__), 'sync-%s.json' % uuid.uuid4())
+        try:
+            self.syncer.state.save(path)
+            self.syncer.state = SyncState.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(len(self.sync()), 30)  # The interrupted record too
+
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        from pyimgur.fakeserver import FakeImgurServer
+        from pyimgur.index import Index
+        self.server = FakeImgurServer(albums=6, images_per_album=3, page_size=4).start()
+        self.index = Index()
+        self.i = self.server.client(index=self.index)
+
+    def tearDown(self):
+        self.server.stop()
+        self.index.close()
+
+    def test_write_through(self):
+        self.i.get_image('img00001')
+        self.i.get_album('alb00002')
+        self.i.get_account('someone')
+        self.assertEqual(self.index.get_image('img00001')['title'], 'Image 1')
+        self.assertEqual([image['id'] for image in self.index.album_images('alb00002')],
+                         ['img00006', 'img00007', 'img00008'])
+        self.assertEqual(self.index.get_account('someone')['url'], 'someone')
+        self.assertEqual(self.index.get_image('missing'), None)
+
+    def test_listings_and_queries(self):
+        list(self.i.get_account_albums(limit=None))
+        list(self.i.get_account_submissions(limit=None))
+        self.assertEqual(len(self.index.albums()), 6)
+        self.assertEqual([album['id'] for album in self.index.albums(since=1400000004)], ['alb00005', 'alb00004'])
+        self.assertEqual([image['id'] for image in self.index.images(min_views=15, limit=2)],
+                         ['img00017', 'img00016'])
+        self.i.get_album('alb00005')
+        self.assertEqual([image['id'] for image in self.index.album_images('alb00005', min_views=16)],
+                         ['img00016', 'img00017'])
+        self.assertEqual([album['id'] for album in self.index.image_albums('img00016')], ['alb00005'])
+
+    def test_delete(self):
+        self.i.get_album('alb00000')
+        self.i.delete_image('img00001')
+        self.assertEqual(self.index.get_image('img00001'), None)
+        self.assertEqual(len(self.index.album_images('alb00000')), 2)
+
+    def test_delete_through_deletehash(self):
+        image = self.i.upload_image_by_url('http://example.com/a.jpg')
+        self.assertEqual(self.index.get_image(image.id)['deletehash'], image.deletehash)
+        self.i.delete_image(image.deletehash)
+        self.assertEqual(self.index.get_image(image.id), None)
+
+    def test_adds_deletehash_column(self):
+        import sqlite3
+        from pyimgur.index import Index
+        path = os.path.join(os.path.dirname(__file__), 'index-%s.db' % uuid.uuid4())
+        try:
+            db = sqlite3.connect(path)
+            db.execute('CREATE TABLE images (id TEXT PRIMARY KEY, account TEXT, datetime INTEGER, '
+                       'views INTEGER, fetched_at REAL NOT NULL, json TEXT NOT NULL)')
+            db.close()
+            index = Index(path)
+            index.store('image', 'Image', {'id': 'abc', 'link': 'x', 'deletehash': 'hash'})
+            index.delete_image('hash')
+            self.assertEqual(index.get_image('abc'), None)
+            index.close()
+        finally:
+            os.remove(path)
+
+    def test_persistent(self):
+        from pyimgur.index import Index
+        path = os.path.join(os.path.dirname(__file__), 'index-%s.db' % uuid.uuid4())
+        try:
+            index = Index(path)
+            self.i.index = index
+            self.i.get_image('img00003')
+            index.close()
+            index = Index(path)
+            self.assertEqual(index.get_image('img00003')['id'], 'img00003')
+            index.close()
+        finally:
+            os.remove(path)